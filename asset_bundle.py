@@ -0,0 +1,179 @@
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+from constants import TILE_SIZE, IMAGES_DIR, IMAGE_FILES, MOVE_SOUND_PATH, ASSET_BUNDLE_PATH
+
+# --- Asset bundle ---
+# Usage: python asset_bundle.py   (run again after changing images or sounds)
+# Packs the tile images into two atlases, opaque and per-pixel alpha, each stored
+# as raw pixels at source size and pre-scaled to TILE_SIZE, together with the
+# move sound, in one file. loader maps it once: the tiles
+# become subsurfaces of the converted atlases, so startup does no PNG decoding,
+# scaling or per-file opens. The header records the size and mtime of every
+# source file (and TILE_SIZE); loader ignores a bundle that no longer matches
+# and falls back to the individual files. BGM stays streamed from SOUNDS_DIR;
+# levels have their own compiled cache (level_cache.py).
+
+MAGIC = b"SOKOBAN-BUNDLE-1\n"
+_HEADER_SIZE = struct.Struct("<I")
+ATLAS_FORMATS = {"opaque": "RGB", "alpha": "RGBA"}
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None # Recorded too: a missing file that appears later makes the bundle stale
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _source_paths():
+    return [os.path.join(IMAGES_DIR, filename) for filename in IMAGE_FILES.values()] + [MOVE_SOUND_PATH]
+
+
+def _pack(images):
+    """Lays `images` ({name: Surface}) out left to right. Returns (atlas Surface, {name: rect})."""
+    rects, x = {}, 0
+    for name, image in images.items():
+        rects[name] = [x, 0, image.get_width(), image.get_height()]
+        x += image.get_width()
+    atlas = pygame.Surface((max(x, 1), max((r[3] for r in rects.values()), default=1)), pygame.SRCALPHA)
+    for name, image in images.items():
+        # MAX onto the transparent atlas copies the pixels exactly; a normal blit would blend the alpha
+        atlas.blit(image, rects[name][:2], special_flags=pygame.BLEND_RGBA_MAX)
+    return atlas, rects
+
+
+def build_bundle(path=ASSET_BUNDLE_PATH):
+    """Writes the bundle for the current assets. Needs a display mode (the dummy driver will do) for convert()."""
+    groups = {group: ({}, {}) for group in ATLAS_FORMATS} # group -> (source images, scaled images)
+    for name, filename in IMAGE_FILES.items():
+        try:
+            image = pygame.image.load(os.path.join(IMAGES_DIR, filename))
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"警告：图片 '{filename}' 无法加载，资源包中将缺少它: {e}")
+            continue
+        # Same conversion and scaling as loader.load_images, so the bundled pixels are identical
+        group = "opaque" if image.get_alpha() is None else "alpha"
+        image = image.convert() if group == "opaque" else image.convert_alpha()
+        groups[group][0][name] = image
+        groups[group][1][name] = pygame.transform.scale(image, (TILE_SIZE, TILE_SIZE))
+
+    move_sound = b""
+    if os.path.exists(MOVE_SOUND_PATH):
+        with open(MOVE_SOUND_PATH, 'rb') as f:
+            move_sound = f.read()
+
+    blobs, atlases, offset = [], {}, 0
+
+    def add_blob(data):
+        nonlocal offset
+        blobs.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+
+    for group, fmt in ATLAS_FORMATS.items():
+        source_images, scaled_images = groups[group]
+        if not source_images:
+            continue
+        source, source_rects = _pack(source_images)
+        scaled, scaled_rects = _pack(scaled_images)
+        atlases[group] = {
+            "source": {"size": source.get_size(), "tiles": source_rects,
+                       "blob": add_blob(pygame.image.tobytes(source, fmt))},
+            "scaled": {"size": scaled.get_size(), "tiles": scaled_rects,
+                       "blob": add_blob(pygame.image.tobytes(scaled, fmt))},
+        }
+    header = {
+        "tile_size": TILE_SIZE,
+        "sources": {p: _stat(p) for p in _source_paths()},
+        "atlases": atlases,
+        "move_sound": add_blob(move_sound) if move_sound else None,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp" # Per process, so concurrent builders never share one
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + _HEADER_SIZE.pack(len(header_bytes)) + header_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, path) # Never leave a half-written bundle behind
+    return header
+
+
+class AssetBundle:
+    """A bundle file mapped into memory. Blobs are read straight from the mapping."""
+
+    def __init__(self, header, data, start):
+        self.header = header
+        self._data = data
+        self._start = start
+
+    def _blob(self, span):
+        offset, length = span
+        return memoryview(self._data)[self._start + offset:self._start + offset + length]
+
+    def load_images(self):
+        """Returns ({name: source Surface}, {name: TILE_SIZE Surface}), all subsurfaces of converted atlases."""
+        sources, tiles = {}, {}
+        for group, atlas in self.header["atlases"].items():
+            for variant, images in (("source", sources), ("scaled", tiles)):
+                info = atlas[variant]
+                surface = pygame.image.frombuffer(self._blob(info["blob"]), info["size"], ATLAS_FORMATS[group])
+                surface = surface.convert() if group == "opaque" else surface.convert_alpha() # Copies off the mapping
+                for name, rect in info["tiles"].items():
+                    images[name] = surface.subsurface(rect)
+        return sources, tiles
+
+    def move_sound(self):
+        """The move sound as a file object for pygame.mixer.Sound, or None if it was not bundled."""
+        span = self.header["move_sound"]
+        return io.BytesIO(self._blob(span)) if span else None
+
+
+def open_bundle(path=ASSET_BUNDLE_PATH):
+    """Maps the bundle at `path`. Returns None if it is missing, corrupt, or older than its source files."""
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None # No bundle (or an empty file): load the individual files
+    try:
+        if data[:len(MAGIC)] != MAGIC:
+            return None
+        start = len(MAGIC) + _HEADER_SIZE.size
+        (header_size,) = _HEADER_SIZE.unpack_from(data, len(MAGIC))
+        header = json.loads(data[start:start + header_size].decode('utf-8'))
+    except (struct.error, ValueError):
+        return None
+    if header.get("tile_size") != TILE_SIZE:
+        return None
+    for source, recorded in header["sources"].items():
+        if _stat(source) != recorded:
+            return None
+    return AssetBundle(header, data, start + header_size)
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1)) # convert() needs a display mode
+    started = time.perf_counter()
+    header = build_bundle(ASSET_BUNDLE_PATH)
+    tiles = sum(len(atlas["source"]["tiles"]) for atlas in header["atlases"].values())
+    print(f"完成: {tiles} 个图片已打包到 '{ASSET_BUNDLE_PATH}' "
+          f"({os.path.getsize(ASSET_BUNDLE_PATH) // 1024} KB)，用时 {time.perf_counter() - started:.2f}s。")
+    pygame.quit()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from constants import LEVELS_DIR, CACHE_DIR
+from board import read_level_file, level_hash
+import collection
+import solver
+
+# --- Parallel batch solver ---
+# Usage: python batch_solve.py [levels_dir | collection.sok] --workers N --report report.json
+# Every *.txt file in the directory is one level, in natural order (level2
+# before level10), with no limit on the count and no stop at a gap. A
+# collection file (.sok/.xsb/.txt, see collection.py) is solved level by level.
+# No pygame is initialized. Solved and unsolvable results are cached by level
+# content hash plus solver settings, so unchanged levels are skipped on the
+# next run; budget-limited results (time, node or memory limit) are not, so a
+# faster solver gets to retry them. A level that cannot be read or makes its
+# worker fail gets an "error" row and the batch goes on; the cache is saved
+# every CACHE_SAVE_EVERY results and when the run ends.
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "solve_cache.json")
+REPORT_FIELDS = ["file", "hash", "status", "moves", "pushes", "nodes", "seconds",
+                 "nodes_per_second", "cached", "solution", "error"]
+STATUS_ERROR = "error" # Report status of a level that could not be read or solved
+CACHE_SAVE_EVERY = 50 # New results between cache saves
+CACHED_STATUSES = (solver.SOLVED, solver.UNSOLVABLE) # Outcomes that do not depend on the time or node budget
+
+
+def _settings_key(settings):
+    return json.dumps(settings, sort_keys=True)
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def level_sources(path):
+    """
+    (name, level map, error) for every level at `path`: each *.txt file of a
+    directory, or each level of a collection file. Report rows use `name` as
+    their "file". A level that cannot be read has no map and an error message.
+    """
+    if os.path.isdir(path):
+        names = sorted((entry.name for entry in os.scandir(path)
+                        if entry.is_file() and entry.name.lower().endswith(".txt")), key=_natural_key)
+        for name in names:
+            try:
+                yield name, read_level_file(os.path.join(path, name)), None
+            except (OSError, UnicodeDecodeError) as e:
+                yield name, None, str(e)
+    else:
+        base = os.path.basename(path)
+        try:
+            levels = collection.open_collection(path)
+        except (OSError, ValueError) as e:
+            yield base, None, str(e)
+            return
+        for i in range(len(levels)):
+            yield f"{base}#{i + 1}", levels[i], None
+
+
+def _error_row(name, digest, message):
+    return {"file": name, "hash": digest, "status": STATUS_ERROR, "moves": 0, "pushes": 0, "nodes": 0,
+            "seconds": 0.0, "nodes_per_second": 0.0, "cached": False, "solution": "", "error": message}
+
+
+def _solve_job(job):
+    """Worker entry point: solves one level and returns a report row."""
+    name, level_map, digest, settings = job
+    result = solver.solve(level_map, **settings)
+    return {
+        "file": name,
+        "hash": digest,
+        "status": result.status,
+        "moves": result.moves,
+        "pushes": result.pushes,
+        "nodes": result.nodes,
+        "seconds": round(result.elapsed, 4),
+        "nodes_per_second": round(result.nodes_per_second, 1),
+        "cached": False,
+        "solution": result.solution or "",
+        "error": "",
+    }
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"警告：缓存文件 '{path}' 无法读取，将重新求解: {e}")
+        return {}
+
+
+def save_cache(path, cache):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp" # Per process, so concurrent runs never share one
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path) # Never leave a half-written cache behind
+
+
+def write_report(path, rows):
+    """Writes rows as JSON, or as CSV when `path` ends in .csv."""
+    if path.lower().endswith(".csv"):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+def batch_solve(path, workers=None, cache_path=DEFAULT_CACHE_PATH, **settings):
+    """
+    Solves every level at `path` (a directory or a collection file, see level_sources) with a process pool.
+    `settings` are passed to solver.solve (method, time_limit, max_nodes, ...).
+    Returns the report rows in level order.
+    """
+    cache = load_cache(cache_path) if cache_path else {}
+    settings_key = _settings_key(settings)
+    names = []
+    rows = {}
+    jobs = []
+    for name, level_map, error in level_sources(path):
+        names.append(name)
+        if error is not None:
+            rows[name] = _error_row(name, "", error)
+            print(f"{name}: 错误 {error}")
+            continue
+        digest = level_hash(level_map)
+        cached = cache.get(f"{digest}:{settings_key}")
+        if cached is not None and cached["status"] in CACHED_STATUSES: # Older caches also kept budget-limited rows
+            rows[name] = dict(cached, file=name, cached=True)
+        else:
+            jobs.append((name, level_map, digest, settings))
+
+    if jobs:
+        unsaved = 0
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_solve_job, job): job for job in jobs}
+                for future in as_completed(futures):
+                    name, _, digest, _ = futures[future]
+                    try:
+                        row = future.result()
+                    except Exception as e: # A failing (or killed) worker costs only its own level
+                        rows[name] = _error_row(name, digest, f"{type(e).__name__}: {e}")
+                        print(f"{name}: 错误 {rows[name]['error']}")
+                        continue
+                    rows[name] = row
+                    print(f"{row['file']}: {row['status']} ({row['pushes']} 推 / {row['moves']} 步, "
+                          f"{row['nodes']} 节点, {row['seconds']:.2f}s)")
+                    if row["status"] not in CACHED_STATUSES:
+                        continue
+                    cache[f"{digest}:{settings_key}"] = row
+                    unsaved += 1
+                    if cache_path and unsaved >= CACHE_SAVE_EVERY:
+                        save_cache(cache_path, cache)
+                        unsaved = 0
+        finally:
+            if cache_path and unsaved:
+                save_cache(cache_path, cache) # Keep what was solved, even if the run is interrupted
+
+    return [rows[name] for name in names]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行求解目录中的所有关卡文件或关卡集中的所有关卡")
+    parser.add_argument("levels", nargs="?", default=LEVELS_DIR,
+                        help="关卡目录 (其中所有 .txt 文件) 或 .sok/.xsb/.txt 关卡集文件")
+    parser.add_argument("--workers", type=int, default=None, help="进程数 (默认: CPU 核数)")
+    parser.add_argument("--report", default="solve_report.json", help="报告文件 (.json 或 .csv)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="结果缓存文件")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--method", choices=["astar", "ida"], default="astar")
+    parser.add_argument("--time-limit", type=float, default=solver.DEFAULT_TIME_LIMIT)
+    parser.add_argument("--max-nodes", type=int, default=solver.DEFAULT_MAX_NODES)
+    parser.add_argument("--max-states", type=int, default=solver.DEFAULT_MAX_STATES)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.levels) and not collection.is_collection_file(args.levels):
+        print(f"错误：关卡目录或关卡集文件 '{args.levels}' 未找到。")
+        return 1
+
+    started = time.perf_counter()
+    rows = batch_solve(
+        args.levels, workers=args.workers, cache_path=None if args.no_cache else args.cache,
+        method=args.method, time_limit=args.time_limit,
+        max_nodes=args.max_nodes, max_states=args.max_states,
+    )
+    write_report(args.report, rows)
+    solved = sum(1 for row in rows if row["status"] == solver.SOLVED)
+    cached = sum(1 for row in rows if row["cached"])
+    print(f"完成: {solved}/{len(rows)} 个关卡已解出 (缓存命中 {cached})，"
+          f"用时 {time.perf_counter() - started:.2f}s，报告已写入 '{args.report}'。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
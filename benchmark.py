@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+# Render with the SDL dummy drivers so the suite runs on headless machines
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from constants import BASE_DIR, INITIAL_SCREEN_WIDTH, INITIAL_SCREEN_HEIGHT, WALL, FLOOR, PLAYER, BOX, GOAL
+import loader
+import game_logic
+import ui
+from board import DIRECTIONS
+import text_cache
+
+# --- Benchmark suite ---
+# Usage: python benchmark.py [--output results.json] [--compare baseline.json --threshold 0.1]
+# Times the hot paths on every shipped level plus synthetic large maps and writes
+# machine-readable results. With --compare, cases whose time per operation grew
+# by more than the threshold are reported as regressions (exit code 1).
+# Startup is timed in fresh interpreters (importing the game, then Game() up to
+# its first rendered frame) and checked against STARTUP_BUDGET_MS (exit code 1
+# when over budget, or when importing the game initializes the mixer or fonts).
+
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_THRESHOLD = 0.10 # 10% slower counts as a regression
+SYNTHETIC_SIZES = [(100, 100), (500, 500)]
+SEED = 1234
+STARTUP_RUNS = 5
+STARTUP_BUDGET_MS = {"startup/import": 400, "startup/first_frame": 800} # Medians, in fresh processes
+
+# Runs in a fresh interpreter; the last line of its output is the JSON result
+_STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+import game
+imported = time.perf_counter()
+import pygame, loader
+lazy = not pygame.mixer.get_init() and not pygame.font.get_init() and \\
+    not any(name in vars(loader) for name in ("bundle", "move_sound", "FONT_SMALL"))
+g = game.Game()
+g.render()
+frame = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_frame": frame - started, "lazy": lazy}))
+"""
+
+
+def synthetic_level(rows, cols, seed=SEED):
+    """Builds a rows x cols level: wall border, ~10% inner walls, ~2% boxes with as many goals, one player."""
+    rng = random.Random(seed)
+    grid = [[WALL] * cols for _ in range(rows)]
+    for r in range(1, rows - 1):
+        for c in range(1, cols - 1):
+            grid[r][c] = WALL if rng.random() < 0.10 else FLOOR
+    free = [(r, c) for r in range(1, rows - 1) for c in range(1, cols - 1) if grid[r][c] == FLOOR]
+    rng.shuffle(free)
+    num_boxes = max(1, len(free) // 50)
+    for r, c in free[:num_boxes]:
+        grid[r][c] = BOX
+    for r, c in free[num_boxes:num_boxes * 2]:
+        grid[r][c] = GOAL
+    pr, pc = free[num_boxes * 2]
+    grid[pr][pc] = PLAYER
+    return grid
+
+
+def _measure(run, ops, repeat, prepare=None):
+    """
+    Runs `run` `repeat` times; returns the result record for `ops` operations per run.
+    If given, `prepare` runs untimed before each run and returns that run's op count.
+    """
+    timings = []
+    for _ in range(repeat):
+        if prepare is not None:
+            ops = prepare() or 1
+        started = time.perf_counter_ns()
+        run()
+        timings.append((time.perf_counter_ns() - started) / ops)
+    timings.sort()
+    median = timings[len(timings) // 2] * ops
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "median_ns": median,
+        "min_ns": timings[0] * ops,
+        "ns_per_op": median / ops,
+        "ops_per_sec": ops * 1e9 / median if median else 0.0,
+    }
+
+
+def _random_moves(count, seed=SEED):
+    rng = random.Random(seed)
+    return [DIRECTIONS[rng.randrange(4)] for _ in range(count)]
+
+
+def bench_level(name, level_idx, screen, surface, moves, repeat):
+    """Benchmarks one entry of loader.levels. Returns {case_name: record}."""
+    results = {}
+
+    def setup():
+        # Large maps get a fixed-size scrolling view, so setup_level is cheap on the window side for every size
+        game_logic.setup_level(level_idx, screen, "menu", level_idx)
+
+    results[f"setup_level/{name}"] = _measure(setup, 1, repeat)
+
+    move_list = _random_moves(moves)
+
+    def run_moves():
+        for dr, dc in move_list:
+            game_logic.move_player_and_boxes(dr, dc, level_idx)
+
+    def prepare_moves():
+        setup()
+        return moves
+
+    results[f"move/{name}"] = _measure(run_moves, moves, repeat, prepare=prepare_moves)
+
+    def run_undo():
+        while len(game_logic.history):
+            game_logic.undo_last_move()
+
+    def prepare_undo():
+        prepare_moves()
+        run_moves()
+        return len(game_logic.history)
+
+    results[f"undo/{name}"] = _measure(run_undo, 1, repeat, prepare=prepare_undo)
+
+    def run_win_check():
+        for _ in range(moves):
+            game_logic.check_level_win_condition(level_idx)
+
+    results[f"win_check/{name}"] = _measure(run_win_check, moves, repeat)
+
+    frames = 30
+    setup()
+
+    def run_render():
+        for _ in range(frames):
+            ui.draw_game_screen(surface, game_logic.board, level_idx, len(loader.levels),
+                                surface.get_width(), surface.get_height(), "playing")
+
+    results[f"draw_game_screen/{name}"] = _measure(run_render, frames, repeat)
+    return results
+
+
+def measure_startup(runs=STARTUP_RUNS):
+    """
+    Times importing the game and reaching its first frame, each run in a new process.
+    Returns ({case_name: record}, lazy) where lazy is False if any import touched the mixer or fonts.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    timings = {"startup/import": [], "startup/first_frame": []}
+    lazy = True
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], cwd=BASE_DIR, env=env,
+                              capture_output=True, text=True, check=True)
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings["startup/import"].append(probe["import"] * 1e9)
+        timings["startup/first_frame"].append(probe["first_frame"] * 1e9)
+        lazy = lazy and probe["lazy"]
+    results = {}
+    for case, values in timings.items():
+        values.sort()
+        median = values[len(values) // 2]
+        results[case] = {"ops": 1, "repeat": runs, "median_ns": median, "min_ns": values[0],
+                         "ns_per_op": median, "ops_per_sec": 1e9 / median if median else 0.0}
+    return results, lazy
+
+
+def check_startup_budget(results, budget=STARTUP_BUDGET_MS):
+    """Returns [(case, median_ms, budget_ms)] for startup cases over budget."""
+    return [(case, results[case]["median_ns"] / 1e6, limit)
+            for case, limit in budget.items() if case in results and results[case]["median_ns"] / 1e6 > limit]
+
+
+def run_suite(moves=20000, repeat=5, include_synthetic=True):
+    pygame.init()
+    screen = pygame.display.set_mode((INITIAL_SCREEN_WIDTH, INITIAL_SCREEN_HEIGHT))
+    loader.load_images() # Needs a display mode for convert()
+    if not loader.levels:
+        loader.load_levels_from_disk()
+    loader.move_sound = None # Time the rules, not the mixer (also keeps the sound from loading)
+    surface = pygame.Surface((INITIAL_SCREEN_WIDTH, INITIAL_SCREEN_HEIGHT))
+
+    cases = [(f"level{i + 1}", i) for i in range(len(loader.levels))]
+    shipped = len(loader.levels)
+    if include_synthetic:
+        for rows, cols in SYNTHETIC_SIZES:
+            loader.levels.append(synthetic_level(rows, cols))
+            cases.append((f"synthetic_{rows}x{cols}", len(loader.levels) - 1))
+
+    results = {}
+    try:
+        for name, level_idx in cases:
+            level_repeat = repeat if level_idx < shipped else max(1, repeat // 2)
+            results.update(bench_level(name, level_idx, screen, surface, moves, level_repeat))
+            print(f"  {name}: 完成")
+    finally:
+        del loader.levels[shipped:]
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Returns [(case, old_ns_per_op, new_ns_per_op, change)] for cases slower than `threshold`."""
+    regressions = []
+    for case, record in current.items():
+        old = baseline.get(case)
+        if not old or not old["ns_per_op"]:
+            continue
+        change = record["ns_per_op"] / old["ns_per_op"] - 1.0
+        if change > threshold:
+            regressions.append((case, old["ns_per_op"], record["ns_per_op"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="推箱子性能基准测试")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果文件 (JSON)")
+    parser.add_argument("--compare", metavar="BASELINE", help="与基线结果比较并报告性能回退")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回退阈值 (0.1 = 慢 10%%)")
+    parser.add_argument("--moves", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-synthetic", action="store_true", help="跳过 100x100 / 500x500 合成地图")
+    parser.add_argument("--no-startup", action="store_true", help="跳过启动时间测试")
+    args = parser.parse_args(argv)
+
+    print("--- 开始基准测试 ---")
+    startup, lazy = ({}, True) if args.no_startup else measure_startup()
+    results = run_suite(args.moves, args.repeat, not args.no_synthetic)
+    results.update(startup)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "moves": args.moves,
+            "repeat": args.repeat,
+            "text_cache": text_cache.cache_stats(),
+            "startup_budget_ms": STARTUP_BUDGET_MS,
+            "lazy_import": lazy,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"结果已写入 '{args.output}'。")
+
+    for case, record in sorted(results.items()):
+        print(f"{case:40s} {record['ns_per_op'] / 1000:12.3f} us/op")
+
+    exit_code = 0
+    for case, median_ms, limit in check_startup_budget(results):
+        print(f"启动时间超出预算: {case}: {median_ms:.1f} ms > {limit} ms")
+        exit_code = 1
+    if not lazy:
+        print("错误：导入游戏模块时初始化了音频或字体 (应在首次使用时才加载)。")
+        exit_code = 1
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for case, old, new, change in regressions:
+            print(f"性能回退: {case}: {old / 1000:.3f} -> {new / 1000:.3f} us/op (+{change:.0%})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"与 '{args.compare}' 相比没有超过 {args.threshold:.0%} 的性能回退。")
+
+    pygame.quit()
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
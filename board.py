@@ -0,0 +1,337 @@
+import hashlib
+import os
+
+from constants import WALL, FLOOR, PLAYER, BOX, GOAL, BOX_ON_GOAL, PLAYER_ON_GOAL
+
+# --- Headless Sokoban rules core ---
+# Level parsing, board state, moves, undo/redo and the win check, with no pygame
+# dependency: game_logic/ui wrap it for the game, and batch tools (solving,
+# replay verification, fuzzing) can import it on a machine without audio/display.
+
+# --- Flat board engine ---
+# The level is stored as two flat bytearrays with one byte per cell:
+#   static  - walls, goals and "void" cells (never change within a level)
+#   dynamic - boxes (change on every push)
+# The grid is padded with a one-cell void border, so a neighbour is always
+# `index + offset` and no bounds checks are needed while moving.
+
+# Static layer flags
+S_WALL = 1
+S_GOAL = 2
+S_VOID = 4  # Border padding and cells past the end of a short row; never drawn
+S_BLOCKED = S_WALL | S_VOID
+
+# Dynamic layer flags
+D_BOX = 1
+
+# Directions in LURD order: (dr, dc)
+DIRECTIONS = ((0, -1), (-1, 0), (0, 1), (1, 0))
+DIRECTION_CHARS = "lurd"
+
+# Results of Board.step / Board.move
+MOVE_NONE = 0
+MOVE_WALK = 1
+MOVE_PUSH = 2
+
+FLOOR_ALIASES = (FLOOR, '-', '_') # Common floor characters in level packs
+
+
+class Board:
+    __slots__ = ("rows", "cols", "width", "static", "dynamic", "player", "offsets",
+                 "goals", "boxes_on_goals", "box_changes")
+
+    def __init__(self, level_map):
+        """Builds the flat layers from a level map (rows of tile characters)."""
+        rows = [''.join(row) for row in level_map]
+        self.rows = len(rows)
+        self.cols = max((len(row) for row in rows), default=0)
+        self.width = self.cols + 2
+        size = self.width * (self.rows + 2)
+
+        self.static = bytearray([S_VOID]) * size
+        self.dynamic = bytearray(size)
+        self.player = -1
+        self.offsets = (-1, -self.width, 1, self.width)
+
+        for r, row in enumerate(rows):
+            i = (r + 1) * self.width + 1
+            for char in row:
+                if char == WALL:
+                    self.static[i] = S_WALL
+                elif char in (GOAL, BOX_ON_GOAL, PLAYER_ON_GOAL):
+                    self.static[i] = S_GOAL
+                elif char in (BOX, PLAYER) or char in FLOOR_ALIASES:
+                    self.static[i] = 0
+                else:
+                    self.static[i] = S_WALL # Unknown characters block movement
+
+                if char == BOX or char == BOX_ON_GOAL:
+                    self.dynamic[i] = D_BOX
+                elif char == PLAYER or char == PLAYER_ON_GOAL:
+                    self.player = i
+                i += 1
+
+        # Goal index and running "boxes on goals" counter for O(1) win checks
+        self.goals = tuple(i for i, flags in enumerate(self.static) if flags & S_GOAL)
+        self.boxes_on_goals = sum(1 for i in self.goals if self.dynamic[i])
+        self.box_changes = 0 # Bumped whenever the box layer changes, so views can cache what they drew from it
+
+    @classmethod
+    def from_layers(cls, rows, cols, static, boxes, player, goals):
+        """Builds a board from precompiled layers (see level_cache.py) instead of a level map."""
+        board = cls.__new__(cls)
+        board.rows, board.cols, board.width = rows, cols, cols + 2
+        board.static = bytearray(static) # set_tile_at may edit it, so never share the cached bytes
+        board.dynamic = bytearray(len(static))
+        for b in boxes:
+            board.dynamic[b] = D_BOX
+        board.player = player
+        board.offsets = (-1, -board.width, 1, board.width)
+        board.goals = tuple(goals)
+        board.boxes_on_goals = sum(1 for b in boxes if static[b] & S_GOAL)
+        board.box_changes = 0
+        return board
+
+    def index(self, r, c):
+        """Converts a (row, col) position to a flat cell index."""
+        return (r + 1) * self.width + c + 1
+
+    def coords(self, i):
+        """Converts a flat cell index back to a (row, col) position."""
+        r, c = divmod(i, self.width)
+        return r - 1, c - 1
+
+    def in_bounds(self, r, c):
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def step(self, d):
+        """
+        Moves the player one cell in direction index `d` (see DIRECTIONS),
+        pushing a box if there is one.
+        Returns MOVE_NONE, MOVE_WALK or MOVE_PUSH.
+        """
+        off = self.offsets[d]
+        nxt = self.player + off
+        if self.static[nxt] & S_BLOCKED:
+            return MOVE_NONE
+        if self.dynamic[nxt]:
+            beyond = nxt + off
+            if self.static[beyond] & S_BLOCKED or self.dynamic[beyond]:
+                return MOVE_NONE # Box is blocked
+            self.dynamic[nxt] = 0
+            self.dynamic[beyond] = D_BOX
+            if self.static[nxt] & S_GOAL:
+                self.boxes_on_goals -= 1
+            if self.static[beyond] & S_GOAL:
+                self.boxes_on_goals += 1
+            self.box_changes += 1
+            self.player = nxt
+            return MOVE_PUSH
+        self.player = nxt
+        return MOVE_WALK
+
+    def undo_step(self, d, pushed):
+        """Reverts a successful step() in direction `d`; `pushed` says whether a box moved."""
+        off = self.offsets[d]
+        cur = self.player
+        if pushed:
+            self.dynamic[cur + off] = 0
+            self.dynamic[cur] = D_BOX
+            if self.static[cur + off] & S_GOAL:
+                self.boxes_on_goals -= 1
+            if self.static[cur] & S_GOAL:
+                self.boxes_on_goals += 1
+            self.box_changes += 1
+        self.player = cur - off
+
+    def move(self, dr, dc):
+        """Same as step(), but takes a (dr, dc) delta."""
+        return self.step(DIRECTIONS.index((dr, dc)))
+
+    def is_solved(self):
+        """Checks if every goal cell holds a box."""
+        return self.boxes_on_goals == len(self.goals)
+
+    def box_cells(self):
+        """Returns the flat indices of all boxes."""
+        dynamic = self.dynamic
+        boxes = []
+        i = dynamic.find(D_BOX) # bytearray.find scans in C
+        while i >= 0:
+            boxes.append(i)
+            i = dynamic.find(D_BOX, i + 1)
+        return boxes
+
+    def set_boxes(self, boxes):
+        """Replaces the whole box layer with boxes at the given flat indices."""
+        dynamic = self.dynamic
+        dynamic[:] = bytes(len(dynamic))
+        for b in boxes:
+            dynamic[b] = D_BOX
+        self.boxes_on_goals = sum(1 for b in boxes if self.static[b] & S_GOAL)
+        self.box_changes += 1
+
+    def copy(self):
+        """Returns an independent copy of the board state."""
+        clone = Board.__new__(Board)
+        clone.rows, clone.cols, clone.width = self.rows, self.cols, self.width
+        clone.static = self.static # Never mutated by moves, safe to share
+        clone.dynamic = bytearray(self.dynamic)
+        clone.player = self.player
+        clone.offsets = self.offsets
+        clone.goals = self.goals
+        clone.boxes_on_goals = self.boxes_on_goals
+        clone.box_changes = self.box_changes
+        return clone
+
+    def to_lines(self):
+        """Serializes the current state (including boxes and player) back to level text rows."""
+        lines = []
+        for r in range(self.rows):
+            row = []
+            for c in range(self.cols):
+                i = self.index(r, c)
+                flags = self.static[i]
+                if flags & S_VOID:
+                    row.append(FLOOR)
+                elif flags & S_WALL:
+                    row.append(WALL)
+                elif i == self.player:
+                    row.append(PLAYER_ON_GOAL if flags & S_GOAL else PLAYER)
+                elif self.dynamic[i]:
+                    row.append(BOX_ON_GOAL if flags & S_GOAL else BOX)
+                else:
+                    row.append(GOAL if flags & S_GOAL else FLOOR)
+            lines.append(''.join(row).rstrip())
+        return lines
+
+    def is_goal(self, r, c):
+        return self.in_bounds(r, c) and bool(self.static[self.index(r, c)] & S_GOAL)
+
+    def tile_at(self, r, c):
+        """Returns the tile character at (r, c), ignoring the player."""
+        if not self.in_bounds(r, c):
+            return WALL
+        i = self.index(r, c)
+        flags = self.static[i]
+        if flags & S_BLOCKED:
+            return WALL
+        if self.dynamic[i]:
+            return BOX_ON_GOAL if flags & S_GOAL else BOX
+        return GOAL if flags & S_GOAL else FLOOR
+
+    def set_tile_at(self, r, c, tile_char):
+        """Sets the tile at (r, c) from a tile character."""
+        if not self.in_bounds(r, c):
+            return
+        i = self.index(r, c)
+        if tile_char == WALL:
+            self.static[i] = S_WALL
+        else:
+            self.static[i] = S_GOAL if tile_char in (GOAL, BOX_ON_GOAL, PLAYER_ON_GOAL) else 0
+        self.dynamic[i] = D_BOX if tile_char in (BOX, BOX_ON_GOAL) else 0
+        # Editing the static layer is rare, so the goal index is simply rebuilt
+        self.goals = tuple(j for j, flags in enumerate(self.static) if flags & S_GOAL)
+        self.boxes_on_goals = sum(1 for j in self.goals if self.dynamic[j])
+        self.box_changes += 1
+
+
+class MoveHistory:
+    """
+    Undo/redo log that stores one byte per move instead of board snapshots.
+    Each entry packs the direction index and a push flag; the player and box
+    from/to cells are recovered from the board's current player position.
+    Entries past the cursor are the redo stack.
+    """
+    __slots__ = ("moves", "cursor")
+
+    def __init__(self):
+        self.moves = bytearray()
+        self.cursor = 0
+
+    def __len__(self):
+        return self.cursor
+
+    def record(self, d, result):
+        """Records a step() in direction `d` that returned `result`."""
+        if self.cursor < len(self.moves):
+            del self.moves[self.cursor:] # A new move discards the redo stack
+        self.moves.append(d << 1 | (result == MOVE_PUSH))
+        self.cursor += 1
+
+    def undo(self, board):
+        """Reverts the last recorded move. Returns False if there is nothing to undo."""
+        if self.cursor == 0:
+            return False
+        self.cursor -= 1
+        entry = self.moves[self.cursor]
+        board.undo_step(entry >> 1, entry & 1)
+        return True
+
+    def redo(self, board):
+        """Re-applies the last undone move. Returns False if there is nothing to redo."""
+        if self.cursor == len(self.moves):
+            return False
+        board.step(self.moves[self.cursor] >> 1)
+        self.cursor += 1
+        return True
+
+    def to_lurd(self):
+        """Returns the moves up to the cursor as a LURD string (uppercase for pushes)."""
+        return ''.join(
+            DIRECTION_CHARS[entry >> 1].upper() if entry & 1 else DIRECTION_CHARS[entry >> 1]
+            for entry in self.moves[:self.cursor]
+        )
+
+
+def apply_lurd(board, moves, history=None):
+    """
+    Plays a LURD move string on `board` (case is ignored; uppercase pushes are
+    just the same steps). Returns the number of moves applied, stopping at the
+    first blocked move.
+    """
+    applied = 0
+    for char in moves:
+        d = DIRECTION_CHARS.find(char.lower())
+        if d < 0:
+            continue # Ignore separators and whitespace
+        result = board.step(d)
+        if result == MOVE_NONE:
+            break
+        if history is not None:
+            history.record(d, result)
+        applied += 1
+    return applied
+
+
+# --- Level files ---
+def parse_level(lines):
+    """Parses level text lines into a level map (a list of rows of characters). Blank lines are skipped."""
+    return [list(line.rstrip('\r\n')) for line in lines if line.strip()]
+
+
+def read_level_file(path):
+    """Reads and parses a single level file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_level(f)
+
+
+def level_hash(level_map):
+    """Content hash of a parsed level, independent of line endings and trailing whitespace."""
+    text = '\n'.join(''.join(row).rstrip() for row in level_map)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def list_level_files(levels_dir):
+    """Returns the paths of level1.txt, level2.txt, ... in `levels_dir`, stopping at the first gap."""
+    try:
+        names = {entry.name for entry in os.scandir(levels_dir)} # One directory read instead of a stat per probe
+    except OSError:
+        return []
+    paths = []
+    for i in range(1, 100): # Assuming max 99 levels
+        if f"level{i}.txt" in names:
+            paths.append(os.path.join(levels_dir, f"level{i}.txt"))
+        elif paths or i > 5:
+            break
+    return paths
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+from constants import LEVELS_DIR
+from board import Board, S_WALL, S_GOAL, S_VOID, list_level_files, read_level_file
+import collection
+import solver
+
+# --- Level canonicalization and duplicate detection ---
+# Usage: python canonical.py [levels_dir | collection.sok ...]
+# Two level files are the same puzzle if one is a rotation or reflection of the
+# other, differs only in floor outside the walls or in blank margins, or only in
+# where the player starts within the area it can walk to. canonical_form maps
+# every such variant to one text: outside floor becomes void, the grid is
+# trimmed to its walls, the player moves to the first cell of its area, and the
+# smallest of the 8 symmetric renderings is kept. DuplicateIndex keys levels by
+# the hash of that text, so a collection is deduplicated in one pass and a new
+# level is checked against it with one dict lookup.
+
+# Per-cell codes: the static flags, plus _BOX, _OUTSIDE and _AREA (the player's walkable area)
+_BOX, _OUTSIDE, _AREA = 8, 16, 32
+_AREA_FLOOR, _AREA_GOAL = 'a', 'g' # Placeholders until the player is placed
+
+
+def _cell_char(code):
+    if code & S_VOID or (code & _OUTSIDE and not code & (S_GOAL | _BOX)):
+        return ' ' # Outside floor is the same as no cell at all
+    if code & S_WALL:
+        return '#'
+    if code & _BOX:
+        return '*' if code & S_GOAL else '$'
+    if code & _AREA:
+        return _AREA_GOAL if code & S_GOAL else _AREA_FLOOR
+    return '.' if code & S_GOAL else ' '
+
+
+_CELL_CHARS = bytes(ord(_cell_char(code)) for code in range(256))
+_TO_BOX = bytes([0, _BOX]) + bytes(254)
+_TO_OUTSIDE = bytes([0, _OUTSIDE]) + bytes(254)
+_TO_AREA = bytes([0, _AREA]) + bytes(254) # reachable() marks blocked cells with 2: dropped
+_UNMARK = str.maketrans({_AREA_FLOOR: ' ', _AREA_GOAL: '.'})
+
+
+def _or(*layers):
+    """Bitwise OR of equal-length byte strings, done on big integers instead of per byte."""
+    value = 0
+    for layer in layers:
+        value |= int.from_bytes(layer, 'big')
+    return value.to_bytes(len(layers[0]), 'big')
+
+
+def _outside(board):
+    """Mask of cells reachable from the void border without crossing a wall."""
+    static, offsets = board.static, board.offsets
+    seen = bytearray(len(static))
+    seen[0] = 1
+    stack = [0]
+    while stack:
+        cell = stack.pop()
+        for off in offsets:
+            n = cell + off
+            if 0 <= n < len(static) and not seen[n] and not static[n] & S_WALL:
+                seen[n] = 1
+                stack.append(n)
+    return seen
+
+
+def _symmetries(rows):
+    """The 8 rotations and reflections of a grid of equal-length strings."""
+    for grid in (rows, [row[::-1] for row in rows]):
+        for _ in range(4):
+            yield grid
+            grid = [''.join(column) for column in zip(*grid[::-1])] # Rotate 90 degrees clockwise
+
+
+def canonical_form(level_map):
+    """The canonical text of a level (rows joined by newlines); equal for all variants of one puzzle."""
+    board = Board(level_map)
+    layers = [board.static, board.dynamic.translate(_TO_BOX), _outside(board).translate(_TO_OUTSIDE)]
+    if board.player >= 0:
+        layers.append(solver.reachable(board)[0].translate(_TO_AREA))
+    text = _or(*layers).translate(_CELL_CHARS).decode('ascii')
+    width = board.width
+    rows = [text[r * width + 1:r * width + 1 + board.cols] for r in range(1, board.rows + 1)]
+    # Trim to the cells that are left
+    filled = [r for r, row in enumerate(rows) if row.strip()]
+    if not filled:
+        return ""
+    rows = rows[filled[0]:filled[-1] + 1]
+    left = min(len(row) - len(row.lstrip()) for row in rows)
+    right = max(len(row.rstrip()) for row in rows)
+    rows = [row[left:right] for row in rows]
+
+    best = None
+    for grid in _symmetries(rows):
+        text = '\n'.join(grid)
+        # The player's start within its area does not change the puzzle: use the area's first cell
+        marks = [i for i in (text.find(_AREA_FLOOR), text.find(_AREA_GOAL)) if i >= 0]
+        if marks:
+            i = min(marks)
+            text = text[:i] + ('+' if text[i] == _AREA_GOAL else '@') + text[i + 1:]
+        text = text.translate(_UNMARK)
+        if best is None or text < best:
+            best = text
+    return '\n'.join(row.rstrip() for row in best.split('\n'))
+
+
+def canonical_hash(level_map):
+    return hashlib.sha256(canonical_form(level_map).encode('utf-8')).hexdigest()
+
+
+class DuplicateIndex:
+    """Canonical hash -> name of the first level seen with it."""
+
+    def __init__(self):
+        self.first = {}
+
+    def __len__(self):
+        return len(self.first)
+
+    def find(self, digest):
+        """Name of the level already indexed with canonical hash `digest`, or None."""
+        return self.first.get(digest)
+
+    def add(self, name, digest):
+        """Indexes level `name`. Returns the name of the level it duplicates, or None if it is new."""
+        original = self.first.setdefault(digest, name)
+        return None if original == name else original
+
+
+def find_duplicates(named_levels):
+    """One pass over (name, level_map) pairs. Returns [(duplicate name, original name)]."""
+    index = DuplicateIndex()
+    duplicates = []
+    for name, level_map in named_levels:
+        original = index.add(name, canonical_hash(level_map))
+        if original is not None:
+            duplicates.append((name, original))
+    return duplicates
+
+
+def _named_levels(paths):
+    for path in paths:
+        if collection.is_collection_file(path):
+            levels = collection.open_collection(path)
+            for i in range(len(levels)):
+                yield f"{path}#{i + 1}", levels[i]
+        elif os.path.isdir(path):
+            for level_path in list_level_files(path):
+                yield level_path, read_level_file(level_path)
+        else:
+            yield path, read_level_file(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="找出重复的关卡 (包括旋转、镜像和仅外部地板不同的关卡)")
+    parser.add_argument("paths", nargs="*", default=[LEVELS_DIR], help="关卡目录、关卡集文件或单个关卡文件")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    count = 0
+
+    def counted(pairs):
+        nonlocal count
+        for pair in pairs:
+            count += 1
+            yield pair
+
+    duplicates = find_duplicates(counted(_named_levels(args.paths)))
+    for name, original in duplicates:
+        print(f"{name}: 与 {original} 重复")
+    print(f"完成: {count} 个关卡，{len(duplicates)} 个重复，用时 {time.perf_counter() - started:.2f}s。")
+    return 1 if duplicates else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
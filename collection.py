@@ -0,0 +1,88 @@
+import mmap
+import os
+import re
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from constants import FLOOR, PLAYER, BOX, BOX_ON_GOAL, PLAYER_ON_GOAL, COLLECTION_CACHE_SIZE
+
+# --- Level collections (.xsb / .sok / .txt packs) ---
+# A collection file holds many levels: blocks of board rows separated by
+# titles, "Title:" lines, ";" comments and blank lines. open_collection maps
+# the file and makes one regex pass over it, recording only where each block
+# of board rows starts and ends. A level is parsed when it is first indexed
+# (the last COLLECTION_CACHE_SIZE parsed levels are kept), so opening a
+# 10,000-level pack costs one scan and two integers per level. Titles and
+# comments are skipped. The result is a Sequence, so it can stand in for
+# loader.levels.
+
+COLLECTION_EXTENSIONS = (".xsb", ".sok", ".txt")
+# A board row: a wall plus nothing but cells, the "-"/"_" floor and "p"/"b" variants, run lengths and "|" row breaks.
+# One match is a whole level (a run of consecutive board rows).
+_BOARD_ROWS = re.compile(rb"(?m)(?:^(?=[^\n#]*#)[ \t#@+$*._pPbB0-9|\-]*\r?(?:\n|\Z))+")
+_CELL_ALIASES = {'-': FLOOR, '_': FLOOR, 'p': PLAYER, 'P': PLAYER_ON_GOAL, 'b': BOX, 'B': BOX_ON_GOAL}
+_RUN_LENGTH = re.compile(r"(\d+)(\D)")
+
+
+def parse_board(data):
+    """Parses the raw board rows of one level into a level map (see board.parse_level)."""
+    rows = []
+    for line in data.decode('utf-8', 'replace').splitlines():
+        line = line.rstrip()
+        if not line:
+            continue
+        if any(ch.isdigit() for ch in line):
+            line = _RUN_LENGTH.sub(lambda m: m.group(2) * int(m.group(1)), line)
+        for row in line.split('|'):
+            rows.append([_CELL_ALIASES.get(ch, ch) for ch in row])
+    return rows
+
+
+class LevelCollection(Sequence):
+    """The levels of one collection file, parsed on first access."""
+
+    def __init__(self, path, data, starts, ends, cache_size=COLLECTION_CACHE_SIZE):
+        self.path = path
+        self._data = data # The mapped file
+        self.starts = starts # starts[i], ends[i]: byte range of level i's board rows
+        self.ends = ends
+        self.cache_size = cache_size
+        self._parsed = OrderedDict() # level index -> level map
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("level index out of range")
+        level_map = self._parsed.get(i)
+        if level_map is not None:
+            self._parsed.move_to_end(i)
+            return level_map
+        level_map = parse_board(self._data[self.starts[i]:self.ends[i]])
+        self._parsed[i] = level_map
+        if len(self._parsed) > self.cache_size:
+            self._parsed.popitem(last=False)
+        return level_map
+
+
+def is_collection_file(path):
+    return os.path.isfile(path) and path.lower().endswith(COLLECTION_EXTENSIONS)
+
+
+def open_collection(path):
+    """Maps and indexes the collection at `path` (one pass, no level parsed yet)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return LevelCollection(path, b"", array('q'), array('q'))
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    starts, ends = array('q'), array('q')
+    for match in _BOARD_ROWS.finditer(data):
+        starts.append(match.start())
+        ends.append(match.end())
+    return LevelCollection(path, data, starts, ends)
@@ -1,15 +1,28 @@
 import os
-import pygame # For color definitions
 
 # --- 常量定义 ---
 INITIAL_SCREEN_WIDTH = 800
 INITIAL_SCREEN_HEIGHT = 600
 TILE_SIZE = 64  # 您的图片资源的尺寸 (像素)
 FPS = 30 # Frames per second
+IDLE_WAIT_MS = 500 # Longest the loop sleeps in pygame.event.wait when nothing needs redrawing
+WORKER_POLL_MS = 100 # Shorter wait while a hint search or thumbnail job is running
+TEXT_CACHE_SIZE = 256 # Rendered text surfaces kept by text_cache
+COLLECTION_CACHE_SIZE = 64 # Parsed levels a collection file (.xsb/.sok) keeps in memory
+PROFILER_WINDOW = 300 # Frames the F3 overlay's rolling percentiles cover
+PROFILER_REFRESH_MS = 250 # How often the F3 overlay is redrawn while visible
+PROFILER_TRACE_LIMIT = 100000 # Frames kept for the trace written on exit (--profile)
 
 # --- 游戏界面最小尺寸 (setup_level 中使用) ---
 MIN_GAME_SCREEN_WIDTH = 400
 MIN_GAME_SCREEN_HEIGHT_BASE = 300 # 不包含信息区的高度
+# Larger levels are played through a scrolling viewport of at most this many cells
+MAX_VIEW_COLS = 20
+MAX_VIEW_ROWS = 12
+CAMERA_MARGIN = 3 # The view scrolls once the player gets closer than this to its edge
+MINIMAP_MAX_SIZE = (160, 160)
+ZOOM_LEVELS = (16, 24, 32, 48, 64, 96) # Tile sizes for +/- zoom; a new level starts at the largest one <= TILE_SIZE that fits
+TILE_CACHE_MAX_SIZES = 3 # Scaled tile sets kept besides TILE_SIZE
 
 # --- 颜色定义 (新的UI颜色方案) ---
 WHITE = (255, 255, 255)
@@ -34,6 +47,15 @@ MENU_QUIT_BUTTON_HOVER_COLOR = (220, 100, 100)  # 退出按钮悬停颜色
 GAME_INFO_BG_COLOR = (40, 40, 50)
 GAME_INFO_TEXT_COLOR = (200, 200, 200)
 
+# 小地图颜色
+MINIMAP_FLOOR_COLOR = (70, 70, 80)
+MINIMAP_WALL_COLOR = (150, 80, 60)
+MINIMAP_GOAL_COLOR = (60, 160, 60)
+MINIMAP_BOX_COLOR = (210, 170, 60)
+MINIMAP_BOX_ON_GOAL_COLOR = (120, 220, 120)
+MINIMAP_PLAYER_COLOR = (80, 160, 255)
+MINIMAP_VIEW_COLOR = (255, 255, 255)
+
 # 游戏元素字符映射
 WALL = '#'
 FLOOR = ' '
@@ -50,6 +72,17 @@ ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 IMAGES_DIR = os.path.join(ASSETS_DIR, "images")
 FONTS_DIR = os.path.join(ASSETS_DIR, "fonts")
 SOUNDS_DIR = os.path.join(ASSETS_DIR, "sounds")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache") # Generated caches (solver results, ...)
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+ASSET_BUNDLE_PATH = os.path.join(CACHE_DIR, "assets.bundle") # Built by asset_bundle.py, read by loader
+FONT_SUBSET_DIR = os.path.join(CACHE_DIR, "fonts") # Built by font_subset.py, read by loader
+LEVEL_CACHE_PATH = os.path.join(CACHE_DIR, "levels.cache") # Compiled levels, kept up to date by loader (see level_cache.py)
+
+IMAGE_FILES = {
+    "wall": "wall.png", "floor": "floor.png", "player": "player.png",
+    "box": "box.png", "goal": "goal.png", "box_on_goal": "box_on_goal.png",
+    "player_on_goal": "player_on_goal.png"
+}
 
 # --- 声音资源路径 ---
 MOVE_SOUND_PATH = os.path.join(SOUNDS_DIR, "move.wav")
@@ -64,10 +97,11 @@ CHINESE_FONT_NAME = "NotoSansSC-Regular.otf"
 
 # --- UI绘制常量 ---
 MENU_BUTTONS_PER_ROW = 5
+MENU_ROWS_PER_PAGE = 5 # Larger level packs are split into pages
+MENU_BUTTONS_PER_PAGE = MENU_BUTTONS_PER_ROW * MENU_ROWS_PER_PAGE
 MENU_BUTTON_WIDTH = 100
 MENU_BUTTON_HEIGHT = 70
 MENU_BUTTON_PADDING = 20
 MENU_BORDER_RADIUS = 8
-
-# --- 游戏状态和数据常量 ---
-MAX_HISTORY = 50
+THUMBNAIL_SIZE = (88, 58) # Level preview inside a menu button
+THUMBNAIL_MEMORY_LIMIT = 200 # Decoded previews kept in memory
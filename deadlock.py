@@ -0,0 +1,90 @@
+from collections import deque
+
+from board import S_BLOCKED, S_GOAL
+
+# --- Deadlock detection ---
+# Static:  "dead squares", cells from which a lone box can never be pushed to
+#          any goal. Computed once per level.
+# Dynamic: freeze deadlocks, checked after every push. A box is frozen when it
+#          can move along neither axis (walls, dead squares or other frozen
+#          boxes on both sides); this also covers 2x2 blocks of boxes and walls.
+#          A frozen group with any box off a goal can never be solved.
+
+INF = float("inf")
+
+
+def push_distances(board, targets=None):
+    """
+    Minimum number of pushes for a lone box to get from each cell to any goal
+    (or any of the `targets` cells), ignoring other boxes. Cells that can never
+    reach one get INF.
+    """
+    static, offsets = board.static, board.offsets
+    distances = [INF] * len(static)
+    queue = deque()
+    for g in board.goals if targets is None else targets:
+        distances[g] = 0
+        queue.append(g)
+    while queue:
+        cell = queue.popleft()
+        for off in offsets:
+            # A box at `prev` is pushed to `cell` by a player standing at `prev - off`
+            prev = cell - off
+            if distances[prev] == INF and not static[prev] & S_BLOCKED and not static[prev - off] & S_BLOCKED:
+                distances[prev] = distances[cell] + 1
+                queue.append(prev)
+    return distances
+
+
+def dead_squares(board, distances=None):
+    """Returns a bytearray with 1 on every open cell from which no box can reach a goal."""
+    if distances is None:
+        distances = push_distances(board)
+    static = board.static
+    return bytearray(
+        1 if distances[i] == INF and not flags & S_BLOCKED else 0
+        for i, flags in enumerate(static)
+    )
+
+
+def _blocked_on_axis(board, cell, off, dead, walls, frozen):
+    before, after = cell - off, cell + off
+    static, dynamic = board.static, board.dynamic
+    if static[before] & S_BLOCKED or static[after] & S_BLOCKED or before in walls or after in walls:
+        return True
+    if dead[before] and dead[after]:
+        return True # The box could only move onto dead squares
+    for n in (before, after):
+        if dynamic[n] and _is_frozen(board, n, dead, walls, frozen):
+            return True
+    return False
+
+
+def _is_frozen(board, cell, dead, walls, frozen):
+    # While a box is being examined it counts as a wall for its neighbours, which breaks cycles
+    walls.add(cell)
+    result = (_blocked_on_axis(board, cell, 1, dead, walls, frozen)
+              and _blocked_on_axis(board, cell, board.width, dead, walls, frozen))
+    walls.discard(cell)
+    if result:
+        frozen.append(cell)
+    return result
+
+
+def is_freeze_deadlock(board, box, dead):
+    """Checks if the box at `box` is frozen together with at least one box that is not on a goal."""
+    frozen = []
+    if not _is_frozen(board, box, dead, set(), frozen):
+        return False
+    static = board.static
+    return any(not static[b] & S_GOAL for b in frozen)
+
+
+def is_push_deadlock(board, box, dead):
+    """Checks the box that was just pushed onto `box` for a dead square or a freeze deadlock."""
+    return bool(dead[box]) or is_freeze_deadlock(board, box, dead)
+
+
+def find_deadlock(board, dead):
+    """Checks every box on the board. Returns True if the position can no longer be solved."""
+    return any(is_push_deadlock(board, b, dead) for b in board.box_cells())
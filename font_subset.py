@@ -0,0 +1,185 @@
+import ast
+import json
+import os
+import string
+import sys
+import time
+
+import pygame
+
+from constants import BASE_DIR, FONTS_DIR, CHINESE_FONT_NAME, FONT_SUBSET_DIR
+
+# --- UI font subset and glyph cache ---
+# Usage: python font_subset.py [font_path]   (needs fontTools: pip install fonttools)
+# A full CJK font is many megabytes, but the UI only shows the characters in
+# its own string literals. The build step subsets the font to those characters
+# plus printable ASCII and records the source font's size and mtime next to it.
+# loader then opens the small subset instead (see GlyphFont); glyphs it lacks,
+# e.g. after a UI string changed, come from the full font, opened only when
+# first needed. Without a valid subset loader uses the full font as before.
+
+UI_SOURCES = ["ui.py", "game.py", "hint.py", "main.py"] # Modules whose string literals reach the screen
+
+
+def ui_characters(sources=UI_SOURCES):
+    """Every character in the string literals (f-string parts included) of `sources`, plus printable ASCII."""
+    chars = set(string.printable.strip()) | {" "}
+    for name in sources:
+        with open(os.path.join(BASE_DIR, name), 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), name)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                chars.update(ch for ch in node.value if ch.isprintable())
+    return "".join(sorted(chars))
+
+
+def subset_paths(font_path):
+    """(subset font path, manifest path) for a source font."""
+    base = os.path.join(FONT_SUBSET_DIR, os.path.splitext(os.path.basename(font_path))[0] + ".subset")
+    return base + os.path.splitext(font_path)[1], base + ".json"
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def build_subset(font_path, chars=None):
+    """Writes the subset of `font_path` holding `chars` (default: ui_characters()). Returns its path."""
+    from fontTools import subset # Optional: only the build step needs fontTools
+    chars = ui_characters() if chars is None else chars
+    subset_path, manifest_path = subset_paths(font_path)
+    options = subset.Options()
+    options.name_IDs = ["*"] # Keep the family name, so the subset still identifies itself
+    font = subset.load_font(font_path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=chars)
+    subsetter.subset(font)
+    os.makedirs(FONT_SUBSET_DIR, exist_ok=True)
+    subset.save_font(font, subset_path, options)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"source": os.path.abspath(font_path), "source_stat": _stat(font_path), "chars": chars},
+                  f, ensure_ascii=False)
+    return subset_path
+
+
+def open_subset(font_path):
+    """Returns (subset path, covered characters) if a subset of `font_path` was built from its current version, else None."""
+    subset_path, manifest_path = subset_paths(font_path)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest["source"] != os.path.abspath(font_path) or manifest["source_stat"] != _stat(font_path):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    if not os.path.exists(subset_path):
+        return None
+    return subset_path, frozenset(manifest["chars"])
+
+
+class GlyphFont:
+    """
+    Stands in for pygame.font.Font in the UI (render only). Text is composed
+    from glyph surfaces cached per (character, antialias, color), so a new
+    string only rasterizes the characters not seen before at this size.
+    Characters outside the subset come from the full font.
+    """
+
+    def __init__(self, subset_path, chars, full_path, size):
+        self.font = pygame.font.Font(subset_path, size)
+        self.chars = chars
+        self.full_path = full_path
+        self.point_size = size
+        self._full_font = None # Opened on the first character the subset lacks
+        self._glyphs = {} # (char, antialias, color) -> (surface, width, y offset, font)
+        self._advances = {} # (char, next char) -> pen advance between them, kerning included
+
+    def _font_for(self, ch):
+        if ch in self.chars:
+            return self.font
+        if self._full_font is None:
+            self._full_font = pygame.font.Font(self.full_path, self.point_size)
+        return self._full_font
+
+    def _glyph(self, ch, antialias, color):
+        key = (ch, antialias, color)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font = self._font_for(ch)
+            surface = font.render(ch, antialias, color)
+            # Glyphs from the full font sit on the subset's baseline
+            glyph = self._glyphs[key] = (surface, font.size(ch)[0], self.font.get_ascent() - font.get_ascent(), font)
+        return glyph
+
+    def _advance(self, font, ch, next_ch):
+        key = (ch, next_ch) # Both characters come from `font`
+        advance = self._advances.get(key)
+        if advance is None:
+            # Measuring the pair (not the glyphs alone) includes the font's kerning
+            advance = self._advances[key] = font.size(ch + next_ch)[0] - font.size(next_ch)[0]
+        return advance
+
+    def _layout(self, text, antialias, color):
+        """
+        Returns (glyphs, x positions, width) in one pass. Pen positions add up the
+        cached, kerned pair advances; each font run is measured once, and the
+        pairs' rounding drift is spread over the run so it ends where font.render ends it.
+        """
+        glyphs = [self._glyph(ch, antialias, color) for ch in text]
+        xs, width, start = [], 0, 0
+        while start < len(text):
+            font = glyphs[start][3]
+            end = start + 1
+            while end < len(text) and glyphs[end][3] is font:
+                end += 1
+            run, x = [0], 0
+            for i in range(start + 1, end):
+                x += self._advance(font, text[i - 1], text[i])
+                run.append(x)
+            run_width = font.size(text[start:end])[0]
+            drift, last = run_width - (x + glyphs[end - 1][1]), max(end - start - 1, 1)
+            xs.extend(width + x + drift * k // last for k, x in enumerate(run))
+            width += run_width
+            start = end
+        return glyphs, xs, width
+
+    def size(self, text):
+        return self._layout(text, True, (255, 255, 255))[2], self.font.get_height()
+
+    def render(self, text, antialias, color, background=None):
+        color = tuple(color) # pygame.Color is not hashable
+        glyphs, xs, width = self._layout(text, antialias, color)
+        surface = pygame.Surface((width, self.font.get_height()), pygame.SRCALPHA) # 0 wide for "", as font.render
+        if background is not None:
+            surface.fill(background)
+        for (glyph, _, dy, _), x in zip(glyphs, xs):
+            if background is None and glyph.get_flags() & pygame.SRCALPHA:
+                # MAX onto the transparent surface copies anti-aliased coverage; a normal blit would darken it
+                surface.blit(glyph, (x, dy), special_flags=pygame.BLEND_RGBA_MAX)
+            else:
+                surface.blit(glyph, (x, dy))
+        return surface
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    font_path = argv[0] if argv else os.path.join(FONTS_DIR, CHINESE_FONT_NAME)
+    if not os.path.exists(font_path):
+        print(f"错误：字体文件 '{font_path}' 未找到。")
+        return 1
+    try:
+        import fontTools # noqa: F401
+    except ImportError:
+        print("错误：生成字体子集需要 fontTools (pip install fonttools)；游戏会继续使用完整字体。")
+        return 1
+    started = time.perf_counter()
+    chars = ui_characters()
+    subset_path = build_subset(font_path, chars)
+    print(f"完成: {len(chars)} 个字符，'{font_path}' ({os.path.getsize(font_path) // 1024} KB) -> "
+          f"'{subset_path}' ({os.path.getsize(subset_path) // 1024} KB)，用时 {time.perf_counter() - started:.2f}s。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import argparse
 import pygame
 import sys
 import os # Kept for consistency, though not directly used for paths here
@@ -6,16 +7,17 @@ from constants import * # Import all constants
 import loader
 import game_logic
 import ui
+import hint
+import thumbnails
+import profiler
 
 class Game:
-    def __init__(self):
-        # Initialize Pygame (mixer is initialized in loader.py)
+    def __init__(self, profile_trace=None, levels_path=LEVELS_DIR):
+        # Initialize Pygame (importing loader initializes nothing; fonts and sounds load on first use)
         pygame.init()
 
         # Load assets using loader module
-        # loader.py already calls pygame.init() and pygame.mixer.init()
-        # It also loads fonts, sounds (move_sound, initial BGM) at module level.
-        loader.load_all_assets() # This calls load_images and load_levels_from_disk
+        loader.load_all_assets(levels_path) # This calls load_images and load_levels_from_disk
 
         if not loader.levels:
             print("Error: No levels loaded. Exiting.")
@@ -27,14 +29,33 @@ class Game:
         self.screen_height = INITIAL_SCREEN_HEIGHT
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("推箱子 (Sokoban OOP)")
+        loader.start_bgm()
 
         # Game state variables
         self.game_state = "menu"
         self.current_level_index = 0
         self.menu_selected_idx = 0
+        self.menu_page = 0 # Follows the selected level button
         self.clock = pygame.time.Clock()
         self.running = True
-        self.current_menu_buttons = [] # For menu click detection
+        self.current_menu_buttons = {} # Visible menu buttons {index: rect}; hit-testing uses ui.menu_button_at
+        self.hint_service = hint.HintService() # Solver runs in a worker process, polled in update()
+        self.hint_text = None
+        self.thumbnails = thumbnails.ThumbnailCache() # Level previews, rendered in worker processes
+
+        # Redraw scheduler: render() only repaints what changed since the last frame
+        self.full_redraw = True
+        self.dirty_cells = set() # Flat board indices
+        self.dirty_buttons = set() # Menu button indices
+        self.hud_dirty = False
+
+        # Frame profiler: off unless --profile is given or F3 is pressed, so normal frames pay one `if` per phase
+        self.profile_trace = profile_trace # Trace file written on exit (.csv or .json)
+        self.profiler = profiler.FrameProfiler() if profile_trace else None
+        ui.profiler = self.profiler
+        self.profiler_overlay = False
+        self.overlay_dirty = False
+        self.overlay_drawn_at = 0
 
         # Initial UI setup for menu to correctly size screen and get button rects
         if self.game_state == "menu":
@@ -52,49 +73,131 @@ class Game:
 
 
     def run(self):
+        events = None
+        before = self.view_state() # Taken before events are pumped, so mouse hover changes are seen
         while self.running:
-            self.handle_events()
+            frame_profiler = self.profiler
+            if frame_profiler: frame_profiler.start_frame()
+            self.handle_events(events)
+            if frame_profiler: frame_profiler.lap("events")
             self.update() # Currently minimal, can be expanded
-            self.render()
-            self.clock.tick(FPS) # Use FPS from constants.py
+            after = self.view_state()
+            self.mark_dirty(before, after)
+            if frame_profiler: frame_profiler.lap("update")
+            if self.profiler_overlay and pygame.time.get_ticks() - self.overlay_drawn_at >= PROFILER_REFRESH_MS:
+                self.overlay_dirty = True
+            if self.full_redraw or self.dirty_cells or self.dirty_buttons or self.hud_dirty or self.overlay_dirty:
+                self.render()
+                if frame_profiler: frame_profiler.end_frame()
+                self.clock.tick(FPS) # Caps the frame rate while things keep changing
+                events = None
+                before = self.view_state() # The menu may have been laid out again
+            else:
+                before = after
+                # Nothing to redraw: sleep until the next event instead of spinning at FPS
+                busy = self.hint_service.pending or self.thumbnails.pending
+                timeout = WORKER_POLL_MS if busy else IDLE_WAIT_MS
+                if self.profiler_overlay:
+                    timeout = min(timeout, PROFILER_REFRESH_MS)
+                event = pygame.event.wait(timeout)
+                events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
 
+        self.hint_service.shutdown()
+        self.thumbnails.shutdown()
+        if self.profiler and self.profile_trace:
+            self.profiler.dump(self.profile_trace)
+            print(f"帧时间记录已写入 '{self.profile_trace}' ({len(self.profiler.trace)} 帧)。")
         pygame.quit()
         sys.exit()
 
-    def handle_events(self):
+    def start_level(self, level_idx):
+        """Sets up a level, adopts the resized screen and pre-renders the level's static layer."""
+        new_gs, updated_screen = game_logic.setup_level(level_idx, self.screen, self.game_state, level_idx)
+        self.game_state = new_gs
+        if self.screen != updated_screen: self.screen = updated_screen
+        self.screen_width = game_logic.SCREEN_WIDTH; self.screen_height = game_logic.SCREEN_HEIGHT
+        if self.game_state == "playing":
+            ui.bake_static_layer(game_logic.board)
+
+    def open_menu(self, selected_idx):
+        """Switches to the level-select menu, showing the page that holds `selected_idx`."""
+        self.game_state = "menu"
+        self.menu_selected_idx = selected_idx
+        self.menu_page = selected_idx // MENU_BUTTONS_PER_PAGE
+        self.current_menu_buttons, self.screen, self.screen_width, self.screen_height = \
+            ui.draw_level_selection_menu(self.screen, selected_idx, self.screen_width, self.screen_height,
+                                         pygame.mouse.get_pos(), self.menu_page, self.thumbnails)
+
+    def hovered_button(self, mouse_pos=None):
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        return ui.menu_button_at(mouse_pos, self.menu_page, self.screen_width, self.screen_height)
+
+    def turn_menu_page(self, pages):
+        """Moves the menu selection (and with it the page) by `pages` pages."""
+        num_levels = len(loader.levels)
+        base = self.menu_selected_idx if self.menu_selected_idx < num_levels else self.menu_page * MENU_BUTTONS_PER_PAGE
+        self.menu_selected_idx = max(0, min(num_levels - 1, base + pages * MENU_BUTTONS_PER_PAGE))
+
+    def view_state(self):
+        """
+        Snapshot of everything besides board cells that decides what is on screen:
+        (whole-screen key, HUD key, highlighted menu buttons).
+        """
+        in_game = self.game_state in ("playing", "level_complete")
+        return ((self.game_state, self.current_level_index, game_logic.board,
+                 self.screen_width, self.screen_height, self.menu_page,
+                 (ui.tile_size_for(game_logic.board), ui.camera_origin(game_logic.board)) if in_game else None),
+                (game_logic.deadlocked, self.hint_text),
+                (self.menu_selected_idx, self.hovered_button() if self.game_state == "menu" else -1))
+
+    def mark_dirty(self, before, after):
+        """Compares two view_state() snapshots and schedules the matching redraws."""
+        if before[0] != after[0]:
+            self.full_redraw = True # New screen, level, window size, menu page, zoom or camera position
+        elif before[1] != after[1]:
+            self.hud_dirty = True
+        if before[2] != after[2]:
+            self.dirty_buttons.update(i for i in before[2] + after[2] if i >= 0)
+
+    def mark_move(self, old_player, new_player):
+        """Marks the cells a single step or undo/redo can touch: both player cells and the box cells beyond them."""
+        d = new_player - old_player
+        self.dirty_cells.update((old_player, new_player, new_player + d, old_player - d))
+
+    def handle_events(self, events=None):
+        """Handles `events`, or everything in the pygame queue when None."""
         mouse_pos = pygame.mouse.get_pos()
 
-        for event in pygame.event.get():
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 self.running = False
                 return # Exit event loop
 
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                self.full_redraw = True # The window contents were lost
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler_overlay()
+                continue
+
             if self.game_state == "menu":
                 if event.type == pygame.MOUSEMOTION:
-                    if self.current_menu_buttons:
-                        for i, rect in enumerate(self.current_menu_buttons):
-                            if rect.collidepoint(mouse_pos):
-                                self.menu_selected_idx = i
-                                break
+                    i = self.hovered_button(event.pos)
+                    if i >= 0:
+                        self.menu_selected_idx = i
                 
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    if self.current_menu_buttons:
-                        for i, rect in enumerate(self.current_menu_buttons):
-                            if rect.collidepoint(mouse_pos):
-                                if i < len(loader.levels):  # Clicked a level button
-                                    self.current_level_index = i
-                                    self.menu_selected_idx = i
-                                    new_gs, updated_screen = game_logic.setup_level(
-                                        self.current_level_index, self.screen, 
-                                        self.game_state, self.current_level_index
-                                    )
-                                    self.game_state = new_gs
-                                    if self.screen != updated_screen: self.screen = updated_screen
-                                    self.screen_width = game_logic.SCREEN_WIDTH
-                                    self.screen_height = game_logic.SCREEN_HEIGHT
-                                elif i == len(self.current_menu_buttons) - 1: # Quit button
-                                    self.running = False
-                                break
+                    i = self.hovered_button(event.pos)
+                    if 0 <= i < len(loader.levels):  # Clicked a level button
+                        self.current_level_index = i
+                        self.menu_selected_idx = i
+                        self.start_level(self.current_level_index)
+                    elif i == len(loader.levels): # Quit button
+                        self.running = False
+
+                if event.type == pygame.MOUSEWHEEL:
+                    self.turn_menu_page(-event.y)
                 
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_b: loader.switch_bgm()
@@ -115,43 +218,51 @@ class Game:
                             if self.menu_selected_idx == num_menu_options - 1: new_idx = 0
                             elif new_idx >= len(loader.levels) and self.menu_selected_idx < len(loader.levels): new_idx = num_menu_options - 1
                             self.menu_selected_idx = min(num_menu_options - 1, new_idx)
+                        elif event.key == pygame.K_PAGEUP: self.turn_menu_page(-1)
+                        elif event.key == pygame.K_PAGEDOWN: self.turn_menu_page(1)
                         
                         self.menu_selected_idx = max(0, min(self.menu_selected_idx, num_menu_options - 1))
 
                         if event.key == pygame.K_RETURN or event.key == pygame.K_SPACE:
                             if 0 <= self.menu_selected_idx < len(loader.levels):
                                 self.current_level_index = self.menu_selected_idx
-                                new_gs, updated_screen = game_logic.setup_level(
-                                    self.current_level_index, self.screen, 
-                                    self.game_state, self.current_level_index
-                                )
-                                self.game_state = new_gs
-                                if self.screen != updated_screen: self.screen = updated_screen
-                                self.screen_width = game_logic.SCREEN_WIDTH
-                                self.screen_height = game_logic.SCREEN_HEIGHT
+                                self.start_level(self.current_level_index)
                             elif self.menu_selected_idx == len(loader.levels): # Quit
                                 self.running = False
 
+                if self.menu_selected_idx < len(loader.levels):
+                    self.menu_page = self.menu_selected_idx // MENU_BUTTONS_PER_PAGE
+
             elif self.game_state == "playing":
                 moved = False
+                board_before, player_before = game_logic.board, game_logic.board.player
                 if event.type == pygame.KEYDOWN:
                     if event.key in [pygame.K_UP, pygame.K_w]: moved = game_logic.move_player_and_boxes(-1, 0, self.current_level_index)
                     elif event.key in [pygame.K_DOWN, pygame.K_s]: moved = game_logic.move_player_and_boxes(1, 0, self.current_level_index)
                     elif event.key in [pygame.K_LEFT, pygame.K_a]: moved = game_logic.move_player_and_boxes(0, -1, self.current_level_index)
                     elif event.key in [pygame.K_RIGHT, pygame.K_d]: moved = game_logic.move_player_and_boxes(0, 1, self.current_level_index)
-                    elif event.key == pygame.K_r:
-                        new_gs, updated_screen = game_logic.setup_level(self.current_level_index, self.screen, self.game_state, self.current_level_index)
-                        self.game_state = new_gs
-                        if self.screen != updated_screen: self.screen = updated_screen
-                        self.screen_width = game_logic.SCREEN_WIDTH; self.screen_height = game_logic.SCREEN_HEIGHT
+                    elif event.key == pygame.K_r: self.start_level(self.current_level_index)
                     elif event.key == pygame.K_u: game_logic.undo_last_move()
+                    elif event.key == pygame.K_y: game_logic.redo_last_move()
+                    elif event.key == pygame.K_h:
+                        self.hint_service.request(game_logic.board)
+                        self.hint_text = "提示: 计算中..."
                     elif event.key == pygame.K_b: loader.switch_bgm()
                     elif event.key == pygame.K_v: loader.switch_bgm(next_track=False)
+                    elif event.key in [pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS]: ui.zoom(game_logic.board, 1)
+                    elif event.key in [pygame.K_MINUS, pygame.K_KP_MINUS]: ui.zoom(game_logic.board, -1)
+                    elif event.key == pygame.K_0: ui.set_zoom(game_logic.board, ui.fit_tile_size(game_logic.board))
                     elif event.key == pygame.K_ESCAPE:
-                        self.game_state = "menu"
-                        self.current_menu_buttons, self.screen, self.screen_width, self.screen_height =                             ui.draw_level_selection_menu(self.screen, self.current_level_index if loader.levels else 0, 
-                                                          self.screen_width, self.screen_height, mouse_pos)
+                        self.open_menu(self.current_level_index if loader.levels else 0)
                     
+                    if moved or event.key in [pygame.K_r, pygame.K_u, pygame.K_y, pygame.K_ESCAPE]:
+                        # The position changed, so any hint in flight is stale
+                        self.hint_service.cancel()
+                        self.hint_text = None
+
+                    if game_logic.board is board_before and game_logic.board.player != player_before:
+                        self.mark_move(player_before, game_logic.board.player)
+
                     if moved and game_logic.check_level_win_condition(self.current_level_index):
                         self.game_state = "level_complete"
 
@@ -160,24 +271,18 @@ class Game:
                     if event.key in [pygame.K_RETURN, pygame.K_SPACE]:
                         self.current_level_index += 1
                         if self.current_level_index < len(loader.levels):
-                            new_gs, updated_screen = game_logic.setup_level(self.current_level_index, self.screen, self.game_state, self.current_level_index)
-                            self.game_state = new_gs
-                            if self.screen != updated_screen: self.screen = updated_screen
-                            self.screen_width = game_logic.SCREEN_WIDTH; self.screen_height = game_logic.SCREEN_HEIGHT
+                            self.start_level(self.current_level_index)
                         else:
                             self.game_state = "game_complete"
                             self.screen, self.screen_width, self.screen_height =                                 ui.draw_game_completion_screen(self.screen, self.screen_width, self.screen_height)
                     elif event.key == pygame.K_ESCAPE:
-                        self.game_state = "menu"
-                        self.current_menu_buttons, self.screen, self.screen_width, self.screen_height =                             ui.draw_level_selection_menu(self.screen, self.current_level_index if loader.levels else 0, 
-                                                          self.screen_width, self.screen_height, mouse_pos)
+                        self.open_menu(self.current_level_index if loader.levels else 0)
             
             elif self.game_state == "game_complete":
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
-                        self.game_state = "menu"; self.current_level_index = 0; self.menu_selected_idx = 0
-                        self.current_menu_buttons, self.screen, self.screen_width, self.screen_height =                             ui.draw_level_selection_menu(self.screen, self.menu_selected_idx, 
-                                                          self.screen_width, self.screen_height, mouse_pos)
+                        self.current_level_index = 0
+                        self.open_menu(0)
                     elif event.key == pygame.K_q: self.running = False
             
             elif self.game_state == "error_no_levels":
@@ -187,6 +292,25 @@ class Game:
                     self.running = False
 
     def update(self):
+        if self.game_state == "playing":
+            ui.update_camera(game_logic.board) # Scrolls large levels with the player
+        if self.game_state == "menu":
+            # Previews for the visible page first, then the next one; repaint buttons as they arrive
+            first = self.menu_page * MENU_BUTTONS_PER_PAGE
+            self.thumbnails.request(loader.levels, range(first, min(len(loader.levels), first + 2 * MENU_BUTTONS_PER_PAGE)))
+        if self.thumbnails.pending:
+            self.dirty_buttons.update(i for i in self.thumbnails.poll() if i in self.current_menu_buttons)
+
+        # Pick up a finished hint without blocking the frame loop
+        if self.hint_service.pending:
+            result = self.hint_service.poll()
+            if result:
+                status, move = result
+                if status == hint.HINT_MOVE:
+                    self.hint_text = f"提示: {hint.describe_move(move)}"
+                else:
+                    self.hint_text = "提示: 计算失败" if status == hint.HINT_FAILED else "提示: 未找到解法"
+
         # Most game logic is event-driven. This could be used for animations or continuous checks.
         # Example: Ensure BGM is playing if it stopped for some reason (though play(-1) should loop)
         # if loader.BGM_PATHS and not pygame.mixer.music.get_busy():
@@ -197,10 +321,38 @@ class Game:
         mouse_pos = pygame.mouse.get_pos() # Get current mouse position for hover effects
         current_display_surface = pygame.display.get_surface() # Should be self.screen
 
+        frame_profiler = self.profiler
+        if not self.full_redraw and self.game_state in ("menu", "playing"):
+            # Partial redraw: repaint and push only the dirty regions
+            rects = []
+            if self.game_state == "menu":
+                for i in sorted(self.dirty_buttons):
+                    if i in self.current_menu_buttons:
+                        rects.append(ui.draw_menu_button(current_display_surface, i, self.current_menu_buttons[i],
+                                                         self.menu_selected_idx, mouse_pos, self.thumbnails.get(i)))
+            else:
+                rects.extend(ui.draw_game_cells(current_display_surface, game_logic.board, self.dirty_cells))
+                if self.dirty_cells and ui.needs_minimap(game_logic.board):
+                    rects.append(ui.draw_minimap(current_display_surface, game_logic.board))
+                if frame_profiler: frame_profiler.lap("render_board")
+                if self.hud_dirty:
+                    rects.append(ui.draw_hud(current_display_surface, game_logic.board, self.current_level_index,
+                                             len(loader.levels), self.screen_width, self.screen_height,
+                                             game_logic.deadlocked, self.hint_text))
+                    if frame_profiler: frame_profiler.lap("render_hud")
+            if frame_profiler: frame_profiler.lap("render_other")
+            if self.profiler_overlay:
+                rects.append(self.draw_profiler_overlay(current_display_surface))
+            self.clear_dirty()
+            pygame.display.update(rects)
+            if frame_profiler: frame_profiler.lap("flip")
+            return
+
         if self.game_state == "menu" or self.game_state == "error_no_levels":
             temp_idx = self.menu_selected_idx if self.game_state == "menu" else -1
             button_rects, new_s, new_sw, new_sh = ui.draw_level_selection_menu(
-                current_display_surface, temp_idx, self.screen_width, self.screen_height, mouse_pos
+                current_display_surface, temp_idx, self.screen_width, self.screen_height, mouse_pos, self.menu_page,
+                self.thumbnails
             )
             if self.screen != new_s: self.screen = new_s
             self.screen_width, self.screen_height = new_sw, new_sh
@@ -211,14 +363,14 @@ class Game:
             # but the window size is self.screen_width/height
             ui.draw_game_screen(
                 current_display_surface, 
-                game_logic.current_level_data, 
-                game_logic.player_pos, 
+                game_logic.board, 
                 self.current_level_index, 
                 len(loader.levels), 
                 self.screen_width, # Current window width
                 self.screen_height, # Current window height
-                self.game_state, 
-                game_logic.is_original_goal_tile 
+                self.game_state,
+                game_logic.deadlocked,
+                self.hint_text
             )
         
         elif self.game_state == "game_complete":
@@ -228,8 +380,45 @@ class Game:
             if self.screen != new_s: self.screen = new_s
             self.screen_width, self.screen_height = new_sw, new_sh
 
+        if frame_profiler: frame_profiler.lap("render_other")
+        if self.profiler_overlay:
+            self.draw_profiler_overlay(current_display_surface)
+        self.clear_dirty()
         pygame.display.flip()
+        if frame_profiler: frame_profiler.lap("flip")
+
+    def clear_dirty(self):
+        self.full_redraw = False
+        self.dirty_cells.clear()
+        self.dirty_buttons.clear()
+        self.hud_dirty = False
+        self.overlay_dirty = False
+
+    def toggle_profiler_overlay(self):
+        """F3: shows or hides the frame-time overlay, starting the profiler if --profile did not."""
+        self.profiler_overlay = not self.profiler_overlay
+        if self.profiler_overlay:
+            if self.profiler is None:
+                self.profiler = profiler.FrameProfiler()
+            self.overlay_dirty = True
+        else:
+            if not self.profile_trace:
+                self.profiler = None # Nothing to dump on exit, so stop timing altogether
+            self.full_redraw = True # Repaint what the overlay covered
+        ui.profiler = self.profiler
+
+    def draw_profiler_overlay(self, surface):
+        rect = ui.draw_profiler_overlay(surface, self.profiler)
+        self.overlay_drawn_at = pygame.time.get_ticks()
+        if self.profiler: self.profiler.lap("overlay")
+        return rect
 
 if __name__ == '__main__':
-    game_instance = Game()
+    parser = argparse.ArgumentParser(description="推箱子")
+    parser.add_argument("--profile", nargs="?", const="frame_trace.csv", metavar="TRACE",
+                        help="记录每帧各阶段耗时，退出时写入 TRACE (.csv 或 .json，默认 frame_trace.csv)；F3 显示统计")
+    parser.add_argument("--levels", default=LEVELS_DIR, metavar="PATH",
+                        help="关卡目录 (level1.txt, level2.txt, ...) 或 .xsb/.sok/.txt 关卡集文件")
+    args = parser.parse_args()
+    game_instance = Game(profile_trace=args.profile, levels_path=args.levels)
     game_instance.run()
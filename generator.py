@@ -0,0 +1,293 @@
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import WALL, FLOOR, PLAYER, BOX, GOAL, BOX_ON_GOAL, PLAYER_ON_GOAL
+from board import list_level_files, read_level_file
+import canonical
+import collection
+import solver
+
+# --- Procedural level generator ---
+# Usage: python generator.py COUNT -o (levels_dir | pack.sok) [--workers N] [--seed S] [--force]
+# A candidate is a room carved from overlapping random rectangles. Its boxes start
+# on the goals and are pulled away by random reverse play, so every candidate is
+# solvable by construction: undoing the pulls as pushes solves it. The solver
+# then rates it by pushes, moves and search effort; candidates below
+# --min-pushes, too hard for the rating budget, or duplicates of a level already
+# in the output (see canonical.py) are dropped. Workers each generate and rate a
+# batch of seeds; batches are consumed in seed order, so a given --seed gives the
+# same levels for any worker count. Accepted levels are written as levelN.txt
+# files or appended to a collection file, both of which loader reads. There is
+# no default output, so the shipped levels/ directory only changes when asked
+# for, and existing level files are never overwritten without --force.
+
+DEFAULT_ROOM = (7, 8) # Interior rows, columns
+DEFAULT_BOXES = 3
+DEFAULT_PULLS = 80 # Reverse moves per candidate
+DEFAULT_MIN_PUSHES = 10
+DEFAULT_BATCH = 8 # Candidates per worker job
+RATING_MAX_NODES = 200_000 # Solver budget for rating one candidate
+RATING_TIME_LIMIT = 10.0
+ROOM_FILL = 0.55 # Fraction of the interior carved to floor
+MAX_LEVEL_FILES = 99 # list_level_files reads level1.txt .. level99.txt
+
+# fork keeps the workers from re-importing the caller's __main__; spawn is the fallback
+_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def carve_room(rng, rows, cols):
+    """
+    A room of rows x cols interior cells inside a wall ring. Returns (floor mask, width),
+    the mask padded like Board's grid. Rectangles are carved until ROOM_FILL of the
+    interior is floor; each one overlaps the floor so far, so the room is connected.
+    """
+    width = cols + 2
+    floor = bytearray(width * (rows + 2))
+    target = int(rows * cols * ROOM_FILL)
+    carved = []
+    while len(carved) < target:
+        h, w = rng.randint(1, 3), rng.randint(1, 3)
+        if carved:
+            r0, c0 = divmod(rng.choice(carved), width)
+            top, left = rng.randint(r0 - h + 1, r0), rng.randint(c0 - w + 1, c0)
+        else:
+            top, left = rng.randint(1, rows), rng.randint(1, cols)
+        for r in range(max(top, 1), min(top + h, rows + 1)):
+            for c in range(max(left, 1), min(left + w, cols + 1)):
+                i = r * width + c
+                if not floor[i]:
+                    floor[i] = 1
+                    carved.append(i)
+    return floor, width
+
+
+def _area(floor, boxes, start, offsets):
+    """Cells the player can walk to from `start` without moving a box."""
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for off in offsets:
+            n = cell + off
+            if floor[n] and n not in boxes and n not in seen:
+                seen.add(n)
+                queue.append(n)
+    return seen
+
+
+def reverse_play(rng, floor, width, num_boxes, pulls):
+    """
+    Puts the boxes on random goals and pulls them around from a random player
+    position. Returns (goals, boxes, player) or None if no box ended off its goal.
+    """
+    cells = [i for i, f in enumerate(floor) if f]
+    if len(cells) < num_boxes * 2 + 2:
+        return None
+    offsets = (-1, -width, 1, width)
+    goals = rng.sample(cells, num_boxes)
+    boxes = set(goals)
+    player = rng.choice([i for i in cells if i not in boxes])
+    for _ in range(pulls):
+        area = _area(floor, boxes, player, offsets)
+        # Pull `box` one cell along `off`: the player stands next to it and steps back
+        moves = [(box, off) for box in boxes for off in offsets
+                 if box + off in area and floor[box + 2 * off] and box + 2 * off not in boxes]
+        if not moves:
+            break
+        box, off = rng.choice(moves)
+        boxes.remove(box)
+        boxes.add(box + off)
+        player = box + 2 * off
+    if boxes == set(goals):
+        return None
+    # Reverse play only fixes the player's area; where in it the player starts does not matter
+    player = rng.choice(sorted(_area(floor, boxes, player, offsets)))
+    return goals, boxes, player
+
+
+def level_lines(floor, width, goals, boxes, player):
+    """Level text rows. Walls that touch no floor are left out, so the room keeps an irregular outline."""
+    height = len(floor) // width
+    goals = set(goals)
+    lines = []
+    for r in range(height):
+        row = []
+        for c in range(width):
+            i = r * width + c
+            if floor[i]:
+                if i == player:
+                    row.append(PLAYER_ON_GOAL if i in goals else PLAYER)
+                elif i in boxes:
+                    row.append(BOX_ON_GOAL if i in goals else BOX)
+                else:
+                    row.append(GOAL if i in goals else FLOOR)
+            elif any(floor[n] for n in _neighbours8(r, c, width, height)):
+                row.append(WALL)
+            else:
+                row.append(FLOOR)
+        lines.append(''.join(row).rstrip())
+    return [line for line in lines if line]
+
+
+def _neighbours8(r, c, width, height):
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            if (dr or dc) and 0 <= r + dr < height and 0 <= c + dc < width:
+                yield (r + dr) * width + c + dc
+
+
+def difficulty(result):
+    """One number to sort levels by: pushes weigh most, then moves and (log) search effort."""
+    return round(result.pushes + 0.25 * result.moves + 2 * math.log2(1 + result.nodes), 1)
+
+
+def generate_candidate(seed, rows, cols, num_boxes, pulls):
+    """The level rows for `seed`, or None if this seed gives no usable layout."""
+    rng = random.Random(seed)
+    floor, width = carve_room(rng, rows, cols)
+    placed = reverse_play(rng, floor, width, num_boxes, pulls)
+    if placed is None:
+        return None
+    return level_lines(floor, width, *placed)
+
+
+def _generate_job(job):
+    """Worker entry point: generates and rates seeds [first, first + count). Returns the accepted ones."""
+    first, count, settings = job
+    accepted = []
+    for seed in range(first, first + count):
+        lines = generate_candidate(seed, settings["rows"], settings["cols"], settings["boxes"], settings["pulls"])
+        if lines is None:
+            continue
+        result = solver.solve([list(line) for line in lines], max_nodes=settings["max_nodes"],
+                              time_limit=settings["time_limit"])
+        if result.solved and result.pushes >= settings["min_pushes"]:
+            accepted.append({"seed": seed, "lines": lines, "pushes": result.pushes, "moves": result.moves,
+                             "nodes": result.nodes, "difficulty": difficulty(result)})
+    return accepted
+
+
+def generate(count, seed=0, workers=None, batch=DEFAULT_BATCH, max_attempts=None, existing=(), **settings):
+    """
+    Generates `count` accepted levels (fewer if max_attempts seeds run out).
+    `existing` level maps are never repeated. Returns (levels, seeds tried) in seed order.
+    """
+    settings = dict({"rows": DEFAULT_ROOM[0], "cols": DEFAULT_ROOM[1], "boxes": DEFAULT_BOXES,
+                     "pulls": DEFAULT_PULLS, "min_pushes": DEFAULT_MIN_PUSHES,
+                     "max_nodes": RATING_MAX_NODES, "time_limit": RATING_TIME_LIMIT}, **settings)
+    max_attempts = max_attempts or count * 100
+    workers = workers or os.cpu_count() or 1
+    duplicates = canonical.DuplicateIndex()
+    for i, level_map in enumerate(existing):
+        duplicates.add(("existing", i), canonical.canonical_hash(level_map))
+
+    levels = []
+    pending = deque() # (future, seeds in the job), in seed order
+    next_seed, tried = seed, 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD)) as pool:
+        while len(levels) < count and (pending or next_seed < seed + max_attempts):
+            # A few jobs per worker stay queued, so no worker idles while results are taken in order
+            while len(pending) < workers * 2 and next_seed < seed + max_attempts:
+                size = min(batch, seed + max_attempts - next_seed)
+                pending.append((pool.submit(_generate_job, (next_seed, size, settings)), size))
+                next_seed += size
+            future, size = pending.popleft()
+            tried += size
+            for level in future.result():
+                if len(levels) < count and \
+                        duplicates.add(level["seed"], canonical.canonical_hash(level["lines"])) is None:
+                    levels.append(level)
+        for future, _ in pending:
+            future.cancel() # Jobs already running finish, but their levels are not used
+    return levels, tried
+
+
+def _existing_levels(output):
+    if collection.is_collection_file(output):
+        return collection.open_collection(output)
+    if os.path.isdir(output):
+        return [read_level_file(path) for path in list_level_files(output)]
+    return []
+
+
+def _level_paths(output, count):
+    """Paths of the next `count` levelN.txt files of directory `output`."""
+    first = len(list_level_files(output)) + 1
+    return [os.path.join(output, f"level{n}.txt") for n in range(first, first + count)]
+
+
+def _existing_paths(output, count):
+    """Level files that writing `count` levels to `output` would overwrite (after a gap in the numbering)."""
+    if output.lower().endswith(collection.COLLECTION_EXTENSIONS):
+        return [] # Collections are appended to
+    return [path for path in _level_paths(output, count) if os.path.exists(path)]
+
+
+def write_levels(output, levels, force=False):
+    """
+    Writes `levels` as the next levelN.txt files of directory `output`, or appends them to a collection file.
+    Raises FileExistsError instead of overwriting a level file, unless `force`.
+    """
+    if output.lower().endswith(collection.COLLECTION_EXTENSIONS):
+        with open(output, 'a', encoding='utf-8') as f:
+            for level in levels:
+                f.write(f"; seed {level['seed']}, {level['pushes']} pushes, {level['moves']} moves, "
+                        f"difficulty {level['difficulty']}\n\n" + '\n'.join(level["lines"]) + "\n\n")
+        return [output] * len(levels)
+    paths = _level_paths(output, len(levels))
+    existing = [path for path in paths if os.path.exists(path)]
+    if existing and not force:
+        raise FileExistsError(existing[0])
+    os.makedirs(output, exist_ok=True)
+    for path, level in zip(paths, levels):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(level["lines"]) + '\n')
+    if paths and paths[-1] not in list_level_files(output): # Past level99.txt
+        print(f"警告：游戏只读取目录中的前 {MAX_LEVEL_FILES} 个关卡；大量关卡请输出为 .sok 关卡集文件。")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用反向推箱生成保证有解的新关卡，并按求解难度评分")
+    parser.add_argument("count", type=int, help="要生成的关卡数")
+    parser.add_argument("-o", "--output", required=True, help="关卡目录 (写入 levelN.txt) 或 .sok/.xsb 关卡集文件")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的关卡文件")
+    parser.add_argument("--seed", type=int, default=None, help="起始随机种子 (默认: 当前时间)")
+    parser.add_argument("--workers", type=int, default=None, help="进程数 (默认: CPU 核数)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROOM[0], help="房间内部行数")
+    parser.add_argument("--cols", type=int, default=DEFAULT_ROOM[1], help="房间内部列数")
+    parser.add_argument("--boxes", type=int, default=DEFAULT_BOXES)
+    parser.add_argument("--pulls", type=int, default=DEFAULT_PULLS, help="每个候选关卡的反向拉箱步数")
+    parser.add_argument("--min-pushes", type=int, default=DEFAULT_MIN_PUSHES, help="最优解至少需要的推箱次数")
+    parser.add_argument("--max-nodes", type=int, default=RATING_MAX_NODES, help="评分时求解器的节点上限")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="每个任务生成的候选数")
+    args = parser.parse_args(argv)
+
+    existing = [] if args.force else _existing_paths(args.output, args.count)
+    if existing: # Checked before generating, so no work is thrown away
+        print(f"错误：关卡文件 '{existing[0]}' 已存在；使用 --force 覆盖。")
+        return 1
+    seed = args.seed if args.seed is not None else int(time.time())
+    started = time.perf_counter()
+    levels, tried = generate(args.count, seed, args.workers, args.batch, existing=_existing_levels(args.output),
+                             rows=args.rows, cols=args.cols, boxes=args.boxes, pulls=args.pulls,
+                             min_pushes=args.min_pushes, max_nodes=args.max_nodes)
+    elapsed = time.perf_counter() - started
+    for path, level in zip(write_levels(args.output, levels, force=args.force), levels):
+        print(f"{os.path.basename(path)}: 种子 {level['seed']}，{level['pushes']} 推 / {level['moves']} 步，"
+              f"{level['nodes']} 节点，难度 {level['difficulty']}")
+    cores = min(args.workers or os.cpu_count() or 1, os.cpu_count() or 1)
+    print(f"完成: {len(levels)}/{args.count} 个关卡 (尝试 {tried} 个种子，起始种子 {seed})，用时 {elapsed:.2f}s，"
+          f"{len(levels) / elapsed / cores:.2f} 关卡/秒/核。")
+    return 0 if len(levels) == args.count else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import multiprocessing
+import queue
+
+from board import DIRECTION_CHARS
+import solver
+
+# --- Background hint search ---
+# The solver runs in a separate worker process so Game.run never blocks.
+# Every request gets a new job id; bumping the shared "latest job" id cancels
+# whatever the worker is doing, and results for older ids are dropped. A worker
+# that dies (e.g. out of memory) fails the pending hint; the next request starts
+# a new one.
+
+HINT_TIME_LIMIT = 10.0 # Seconds per hint search
+
+# Hint statuses returned by HintService.poll()
+HINT_MOVE = "move"
+HINT_NONE = "none" # No solution from this position (or the budget ran out)
+HINT_FAILED = "failed" # The worker process died during the search
+
+# fork keeps the worker from re-importing the game's __main__ (and pygame); spawn is the fallback
+_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _worker_main(jobs, results, latest_job):
+    """Worker process loop: solves (job_id, level_lines) jobs until it receives None."""
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, level_lines = job
+        if latest_job.value != job_id:
+            continue # Superseded before it started
+        result = solver.solve(level_lines, time_limit=HINT_TIME_LIMIT,
+                              cancel=lambda: latest_job.value != job_id)
+        if result.status == solver.CANCELLED:
+            continue
+        move = result.solution[0] if result.solved and result.solution else None
+        results.put((job_id, move))
+
+
+class HintService:
+    """Owns the hint worker process and the job/result queues."""
+
+    def __init__(self):
+        self._context = multiprocessing.get_context(_START_METHOD)
+        self._process = None
+        self._jobs = None
+        self._results = None
+        self._latest_job = None
+        self._job_id = 0
+        self.pending = False
+
+    def _ensure_worker(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        self._jobs = self._context.Queue()
+        self._results = self._context.Queue()
+        self._latest_job = self._context.RawValue('i', self._job_id)
+        self._process = self._context.Process(
+            target=_worker_main, args=(self._jobs, self._results, self._latest_job), daemon=True
+        )
+        self._process.start()
+
+    def request(self, board):
+        """Starts a hint search from the current board state, cancelling any older one."""
+        self._ensure_worker()
+        self._job_id += 1
+        self._latest_job.value = self._job_id
+        self._jobs.put((self._job_id, board.to_lines()))
+        self.pending = True
+
+    def cancel(self):
+        """Cancels the running search (called whenever the position changes)."""
+        if not self.pending:
+            return
+        self._job_id += 1
+        self._latest_job.value = self._job_id
+        self.pending = False
+
+    def poll(self):
+        """
+        Non-blocking check for the current job's result.
+        Returns None while waiting, else (HINT_MOVE, lurd_char), (HINT_NONE, None) or (HINT_FAILED, None).
+        """
+        if not self.pending:
+            return None
+        while True:
+            try:
+                job_id, move = self._results.get_nowait()
+            except queue.Empty:
+                if self._process.is_alive():
+                    return None
+                print(f"警告：提示进程意外退出 (退出码 {self._process.exitcode})，下次请求时将重新启动。")
+                self.pending = False # _ensure_worker starts a new worker for the next request
+                return HINT_FAILED, None
+            if job_id == self._job_id:
+                self.pending = False
+                return (HINT_MOVE, move) if move else (HINT_NONE, None)
+
+    def shutdown(self):
+        if self._process is None:
+            return
+        self._latest_job.value = -1 # Cancel the current search
+        self._jobs.put(None)
+        self._process.join(timeout=1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+
+def describe_move(move):
+    """Turns a LURD character into HUD text, e.g. 'R' -> '向右推'."""
+    direction = "左上右下"[DIRECTION_CHARS.index(move.lower())]
+    return f"向{direction}推" if move.isupper() else f"向{direction}走"
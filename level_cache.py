@@ -0,0 +1,187 @@
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+from constants import LEVELS_DIR, LEVEL_CACHE_PATH
+from board import Board, list_level_files, parse_level, level_hash
+import canonical
+import deadlock
+
+# --- Compiled level cache ---
+# Usage: python level_cache.py [levels_dir]   (optional: loader builds and refreshes it on its own)
+# Each level file is compiled once into what setup_level needs: the flat static
+# grid, goal and box cells, the player start, the dimensions, the content and
+# canonical hashes, and the dead squares, which are the slow part.
+# Everything goes into one file: MAGIC, a JSON header with one entry per level
+# file, then the binary layers. An entry is reused while the file's size and
+# mtime match. When they change but the content hash does not (a touched or
+# re-saved file) only the recorded stat is updated. Only files whose content
+# changed are compiled again, and entries for files no longer loaded are dropped.
+
+MAGIC = b"SOKOBAN-LEVELS-3\n"
+_HEADER_SIZE = struct.Struct("<I")
+_CELL_ARRAY = "I" # Box and goal cell indices
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class CompiledLevel:
+    """One compiled level file. `static` and `dead` are per-cell bytes of the padded grid."""
+    __slots__ = ("stat", "hash", "canonical", "rows", "cols", "player", "static", "boxes", "goals", "dead", "lines")
+
+    def __init__(self, stat, hash, canonical, rows, cols, player, static, boxes, goals, dead, lines):
+        self.stat = stat
+        self.hash = hash
+        self.canonical = canonical # canonical.canonical_hash: equal for rotated/mirrored copies
+        self.rows = rows
+        self.cols = cols
+        self.player = player # -1 if the level has no player
+        self.static = static
+        self.boxes = boxes
+        self.goals = goals
+        self.dead = dead
+        self.lines = lines # The level's text rows, for loader.levels
+
+    def board(self):
+        return Board.from_layers(self.rows, self.cols, self.static, self.boxes, self.player, self.goals)
+
+    def level_map(self):
+        return [list(line) for line in self.lines]
+
+
+def compile_level(level_map, stat):
+    """Compiles a parsed level. Returns None for an empty level."""
+    if not any(row for row in level_map):
+        return None
+    board = Board(level_map)
+    return CompiledLevel(stat, level_hash(level_map), canonical.canonical_hash(level_map), board.rows, board.cols,
+                         board.player, bytes(board.static), tuple(board.box_cells()), board.goals,
+                         bytes(deadlock.dead_squares(board)), [''.join(row) for row in level_map])
+
+
+def read_cache(path=LEVEL_CACHE_PATH):
+    """{level file path: CompiledLevel} from the cache file, or {} if it is missing or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            return {}
+        start = len(MAGIC) + _HEADER_SIZE.size
+        (header_size,) = _HEADER_SIZE.unpack_from(data, len(MAGIC))
+        header = json.loads(data[start:start + header_size].decode('utf-8'))
+    except (OSError, struct.error, ValueError):
+        return {}
+    base = start + header_size
+
+    def blob(span):
+        return data[base + span[0]:base + span[0] + span[1]]
+
+    def cells(span):
+        return tuple(array(_CELL_ARRAY, blob(span)))
+
+    entries = {}
+    try:
+        for level_path, e in header["levels"].items():
+            entries[level_path] = CompiledLevel(
+                e["stat"], e["hash"], e["canonical"], e["rows"], e["cols"], e["player"], blob(e["static"]),
+                cells(e["boxes"]), cells(e["goals"]), blob(e["dead"]),
+                blob(e["lines"]).decode('utf-8').split('\n'))
+    except (KeyError, TypeError, ValueError):
+        return {}
+    return entries
+
+
+def write_cache(entries, path=LEVEL_CACHE_PATH):
+    blobs, header, offset = [], {}, 0
+
+    def add_blob(data):
+        nonlocal offset
+        blobs.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+
+    for level_path, level in entries.items():
+        header[level_path] = {
+            "stat": level.stat, "hash": level.hash, "canonical": level.canonical,
+            "rows": level.rows, "cols": level.cols, "player": level.player,
+            "static": add_blob(level.static),
+            "boxes": add_blob(array(_CELL_ARRAY, level.boxes).tobytes()),
+            "goals": add_blob(array(_CELL_ARRAY, level.goals).tobytes()),
+            "dead": add_blob(level.dead),
+            "lines": add_blob('\n'.join(level.lines).encode('utf-8')),
+        }
+    header_bytes = json.dumps({"levels": header}).encode('utf-8')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp" # Per process, so concurrent writers never share one
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + _HEADER_SIZE.pack(len(header_bytes)) + header_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, path) # Never leave a half-written cache behind
+
+
+def load_levels(paths, cache_path=LEVEL_CACHE_PATH):
+    """
+    Compiled levels for `paths`, in order; None for an empty or unreadable file (reported).
+    Stale entries are compiled again, entries for files not in `paths` are dropped,
+    and the cache file is rewritten if anything changed.
+    """
+    entries = read_cache(cache_path)
+    changed = False
+    compiled = []
+    for path in paths:
+        key = os.path.abspath(path)
+        cached = entries.get(key)
+        try:
+            stat = _stat(path)
+            if cached is not None and cached.stat == stat:
+                compiled.append(cached)
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                level_map = parse_level(f)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"错误: 加载关卡文件 '{path}' 失败: {e}")
+            compiled.append(None)
+            continue
+        if cached is not None and cached.hash == level_hash(level_map):
+            cached.stat = stat # Same content: keep the analysis, remember the new stat
+            level = cached
+        else:
+            level = compile_level(level_map, stat)
+        if level is not None:
+            entries[key] = level
+        else:
+            entries.pop(key, None)
+        compiled.append(level)
+        changed = True
+    keep = {os.path.abspath(path) for path in paths}
+    for key in [key for key in entries if key not in keep]:
+        del entries[key] # Deleted or no longer listed level files
+        changed = True
+    if changed:
+        try:
+            write_cache(entries, cache_path)
+        except OSError as e:
+            print(f"警告：无法写入关卡缓存 '{cache_path}': {e}")
+    return compiled
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    levels_dir = argv[0] if argv else LEVELS_DIR
+    paths = list_level_files(levels_dir)
+    started = time.perf_counter()
+    compiled = load_levels(paths)
+    print(f"完成: {sum(1 for level in compiled if level is not None)}/{len(paths)} 个关卡已编译到 "
+          f"'{LEVEL_CACHE_PATH}'，用时 {time.perf_counter() - started:.3f}s。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,38 +6,80 @@ import pygame
 # if constants.py is not in the Python path. For now, assume it's accessible.
 from constants import (
     TILE_SIZE, IMAGES_DIR, LEVELS_DIR, SOUNDS_DIR, FONTS_DIR,
-    CHINESE_FONT_NAME, MOVE_SOUND_PATH, BGM_PATHS
+    CHINESE_FONT_NAME, MOVE_SOUND_PATH, BGM_PATHS, IMAGE_FILES # IMAGE_FILES is shared with thumbnails.py
 )
+from board import list_level_files
+import asset_bundle
+import canonical
+import collection
+import level_cache
+import font_subset
 
 # --- Global variables for loaded assets ---
 IMAGES = {}
-IMAGE_FILES = { # This was part of main.py, closely tied to load_images
-    "wall": "wall.png", "floor": "floor.png", "player": "player.png",
-    "box": "box.png", "goal": "goal.png", "box_on_goal": "box_on_goal.png",
-    "player_on_goal": "player_on_goal.png"
-}
+SOURCE_IMAGES = {} # Unscaled originals, kept so tile_cache can build other zoom levels without disk reads
 levels = []
-move_sound = None
+compiled_levels = [] # level_cache.CompiledLevel per entry of levels (empty for a collection file)
 current_bgm_index = 0
 
-# Font related globals
-CHINESE_FONT_PATH = "" # Determined by logic below
-FONT_LARGE = None
-FONT_MEDIUM = None
-FONT_SMALL = None
-FONT_BUTTON = None
+# --- Lazy resources ---
+# Importing loader (and ui / game_logic, which import it) initializes nothing:
+# the resources below are created on first access through the module
+# __getattr__ (PEP 562), so headless tools never touch the mixer or the font
+# system. Once created, a resource is an ordinary module global and later reads
+# never reach __getattr__. Read them as loader.X; `from loader import X` would
+# load X at import time.
+#   bundle                                          prebuilt asset bundle (python asset_bundle.py), or None
+#   move_sound                                      pygame.mixer.Sound, or None
+#   CHINESE_FONT_PATH, FONT_LARGE, FONT_MEDIUM,
+#   FONT_SMALL, FONT_BUTTON                         font path and pygame.font.Font objects (None on failure)
+# BGM starts when the game calls start_bgm().
+
+def __getattr__(name):
+    load = _LAZY_RESOURCES.get(name)
+    if load is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    load()
+    return globals()[name]
+
+
+def _load_bundle():
+    global bundle
+    bundle = asset_bundle.open_bundle()
 
-# --- Initialization ---
-# It's good practice to initialize pygame modules if this loader is meant to be somewhat standalone
-# or if its functions are called before main.py's own pygame.init().
-pygame.init() # General pygame init
-pygame.mixer.init() # Explicitly init mixer for sounds
-# pygame.font.init() # Explicitly init font if needed, pygame.init() usually covers it.
+
+def _get_bundle():
+    # In-module reads of a lazy global bypass __getattr__, so go through the module dict
+    return globals()["bundle"] if "bundle" in globals() else __getattr__("bundle")
+
+
+def _init_mixer():
+    """Initializes the mixer on first use. Returns False if there is no audio device."""
+    if pygame.mixer.get_init():
+        return True
+    try:
+        pygame.mixer.init()
+    except pygame.error as e:
+        print(f"警告：音频初始化失败，将没有声音：{e}")
+        return False
+    return True
 
 # --- Image Loading ---
 def load_images():
     """Loads all game images and scales them to TILE_SIZE."""
     global IMAGES, TILE_SIZE # Ensure TILE_SIZE from constants is used
+    bundle = _get_bundle()
+    if bundle is not None:
+        try:
+            sources, tiles = bundle.load_images()
+        except (pygame.error, ValueError) as e:
+            print(f"警告：资源包中的图片无法加载，改为逐个加载图片文件: {e}")
+        else:
+            SOURCE_IMAGES.update(sources)
+            IMAGES.update(tiles)
+            if len(IMAGES) == len(IMAGE_FILES):
+                print(f"成功: 从资源包加载了 {len(IMAGES)} 个图片。")
+                return
     all_images_loaded_successfully = True
     for name, filename in IMAGE_FILES.items():
         path = os.path.join(IMAGES_DIR, filename)
@@ -51,6 +93,7 @@ def load_images():
                 image = image.convert()
             else:
                 image = image.convert_alpha()
+            SOURCE_IMAGES[name] = image
             IMAGES[name] = pygame.transform.scale(image, (TILE_SIZE, TILE_SIZE))
             print(f"成功: 图片 '{filename}' 已加载。")
         except pygame.error as e:
@@ -69,48 +112,73 @@ def load_images():
         # sys.exit()
 
 # --- Level Loading ---
-def load_levels_from_disk():
-    """Loads all level files from the LEVELS_DIR."""
-    global levels # To populate the global levels list
+def load_levels_from_disk(levels_dir=LEVELS_DIR):
+    """
+    Loads all level files from `levels_dir` (LEVELS_DIR by default). `levels_dir` may
+    also be a collection file (.xsb/.sok/.txt): it is only indexed here, and its
+    levels are parsed when first played (see collection.py).
+    """
+    global levels, compiled_levels # To populate the global levels list
+    compiled_levels = []
+    if collection.is_collection_file(levels_dir):
+        try:
+            levels = collection.open_collection(levels_dir)
+        except OSError as e:
+            print(f"错误: 读取关卡集 '{levels_dir}' 失败: {e}")
+            levels = []
+            return False
+        if not levels:
+            print(f"错误：关卡集 '{levels_dir}' 中没有找到任何关卡。")
+            return False
+        print(f"成功打开关卡集 '{os.path.basename(levels_dir)}'：{len(levels)} 个关卡。")
+        return True
     levels = []
-    if not os.path.exists(LEVELS_DIR):
-        print(f"错误：关卡目录 '{LEVELS_DIR}' 未找到。")
+    if not os.path.exists(levels_dir):
+        print(f"错误：关卡目录 '{levels_dir}' 未找到。")
         return False # Indicate failure
-    level_files_found = False
-    for i in range(1, 100): # Assuming max 99 levels
-        level_file_path = os.path.join(LEVELS_DIR, f"level{i}.txt")
-        if os.path.exists(level_file_path):
-            level_files_found = True
-            try:
-                with open(level_file_path, 'r', encoding='utf-8') as f:
-                    level_map = [list(line.rstrip('\n')) for line in f.readlines() if line.strip()]
-                if not level_map or not any(row for row in level_map):
-                    print(f"警告：关卡文件 '{level_file_path}' 为空或格式不正确。已跳过。")
-                    continue
-                levels.append(level_map)
-            except Exception as e:
-                print(f"错误: 加载关卡文件 '{level_file_path}' 失败: {e}")
-        elif level_files_found:
-            break 
-        elif i > 5 and not level_files_found: # Optimization from original
-            break
-            
+    # Unchanged files come straight from the compiled level cache, analysis included
+    level_paths = list_level_files(levels_dir)
+    for level_file_path, compiled in zip(level_paths, level_cache.load_levels(level_paths)):
+        if compiled is None:
+            print(f"警告：关卡文件 '{level_file_path}' 为空或格式不正确。已跳过。")
+            continue
+        levels.append(compiled.level_map())
+        compiled_levels.append(compiled)
+    # The canonical hash is cached too, so this costs one dict lookup per level
+    duplicates = canonical.DuplicateIndex()
+    for i, compiled in enumerate(compiled_levels):
+        original = duplicates.add(i, compiled.canonical)
+        if original is not None:
+            print(f"警告：关卡 {i + 1} 与关卡 {original + 1} 相同 (或只是旋转/镜像)。")
+
     if not levels:
         print("错误：在 'levels' 文件夹中没有成功加载任何关卡文件。")
         return False # Indicate failure
     print(f"成功加载 {len(levels)} 个关卡。")
     return True # Indicate success
 
+def compiled_level(level_idx):
+    """The compiled form of levels[level_idx], or None if there is none (collections, levels added at runtime)."""
+    return compiled_levels[level_idx] if 0 <= level_idx < len(compiled_levels) else None
+
 # --- Sound Loading ---
-try:
-    move_sound = pygame.mixer.Sound(MOVE_SOUND_PATH)
-except pygame.error as e:
-    print(f"警告：移动音效加载失败：{e}")
-    move_sound = None # Ensure it's None if loading failed
+def _load_move_sound():
+    global move_sound
+    move_sound = None # Stays None if loading fails
+    if not _init_mixer():
+        return
+    try:
+        bundle = _get_bundle()
+        bundled_sound = bundle.move_sound() if bundle is not None else None
+        move_sound = pygame.mixer.Sound(file=bundled_sound if bundled_sound is not None else MOVE_SOUND_PATH)
+    except pygame.error as e:
+        print(f"警告：移动音效加载失败：{e}")
 
 def switch_bgm(next_track=True, initial_load=False):
     """切换背景音乐 or loads initial BGM."""
     global current_bgm_index
+    if not _init_mixer():
+        return
     try:
         pygame.mixer.music.stop()
         if not initial_load:
@@ -128,60 +196,83 @@ def switch_bgm(next_track=True, initial_load=False):
     except pygame.error as e:
         print(f"切换/加载BGM失败: {e}")
 
-# Initial BGM load
-if BGM_PATHS: # Check if there are any BGM paths defined
-    switch_bgm(initial_load=True)
-else:
-    print("警告: BGM_PATHS为空，不加载背景音乐。")
+def start_bgm():
+    """Starts the first BGM track (the game calls this once its window is up)."""
+    if BGM_PATHS: # Check if there are any BGM paths defined
+        switch_bgm(initial_load=True)
+    else:
+        print("警告: BGM_PATHS为空，不加载背景音乐。")
 
 
 # --- Font Loading ---
-# Logic for CHINESE_FONT_PATH selection
-original_chinese_font_path = os.path.join(FONTS_DIR, CHINESE_FONT_NAME)
-if not os.path.exists(original_chinese_font_path):
-    print(f"错误：找不到字体文件 {original_chinese_font_path}")
-    print(f"请将 '{CHINESE_FONT_NAME}' (或其他中文字体) 放置于 '{FONTS_DIR}' 目录下。")
-    fallback_font = pygame.font.match_font("simhei,microsoftyahei,arialunicodems")
-    if fallback_font:
-        CHINESE_FONT_PATH = fallback_font
-        print(f"警告：将使用系统字体 '{CHINESE_FONT_PATH}'。")
+def _load_fonts():
+    global CHINESE_FONT_PATH, FONT_LARGE, FONT_MEDIUM, FONT_SMALL, FONT_BUTTON
+    FONT_LARGE = FONT_MEDIUM = FONT_SMALL = FONT_BUTTON = None # Stay None if loading fails
+    pygame.font.init()
+
+    # Logic for CHINESE_FONT_PATH selection
+    original_chinese_font_path = os.path.join(FONTS_DIR, CHINESE_FONT_NAME)
+    if not os.path.exists(original_chinese_font_path):
+        print(f"错误：找不到字体文件 {original_chinese_font_path}")
+        print(f"请将 '{CHINESE_FONT_NAME}' (或其他中文字体) 放置于 '{FONTS_DIR}' 目录下。")
+        fallback_font = pygame.font.match_font("simhei,microsoftyahei,arialunicodems")
+        if fallback_font:
+            CHINESE_FONT_PATH = fallback_font
+            print(f"警告：将使用系统字体 '{CHINESE_FONT_PATH}'。")
+        else:
+            CHINESE_FONT_PATH = pygame.font.get_default_font()
+            print(f"警告：将使用默认字体 '{CHINESE_FONT_PATH}'，可能不支持中文。")
     else:
-        CHINESE_FONT_PATH = pygame.font.get_default_font()
-        print(f"警告：将使用默认字体 '{CHINESE_FONT_PATH}'，可能不支持中文。")
-else:
-    CHINESE_FONT_PATH = original_chinese_font_path
-
-# Actual font object loading
-try:
-    if not CHINESE_FONT_PATH: # Should not happen if logic above is correct
-        raise pygame.error("Chinese font path not set.")
-    FONT_LARGE = pygame.font.Font(CHINESE_FONT_PATH, 48)
-    FONT_MEDIUM = pygame.font.Font(CHINESE_FONT_PATH, 32)
-    FONT_SMALL = pygame.font.Font(CHINESE_FONT_PATH, 22)
-    FONT_BUTTON = pygame.font.Font(CHINESE_FONT_PATH, 28)
-except pygame.error as e:
-    print(f"加载字体失败: {e}. 游戏可能无法正确显示文本。")
-    # In a real app, might need more robust error handling or fallback to default font for all sizes
-    # For now, font objects might remain None if this fails.
-    # pygame.quit()
-    # sys.exit() # Exiting here might be too abrupt for a library module
+        CHINESE_FONT_PATH = original_chinese_font_path
+
+    # Actual font object loading: the prebuilt UI subset when there is one (python font_subset.py)
+    subset = font_subset.open_subset(CHINESE_FONT_PATH)
+
+    def make_font(size):
+        if subset is not None:
+            try:
+                return font_subset.GlyphFont(subset[0], subset[1], CHINESE_FONT_PATH, size)
+            except (pygame.error, OSError) as e:
+                print(f"警告：字体子集无法加载，改用完整字体: {e}")
+        return pygame.font.Font(CHINESE_FONT_PATH, size)
+
+    try:
+        if not CHINESE_FONT_PATH: # Should not happen if logic above is correct
+            raise pygame.error("Chinese font path not set.")
+        FONT_LARGE = make_font(48)
+        FONT_MEDIUM = make_font(32)
+        FONT_SMALL = make_font(22)
+        FONT_BUTTON = make_font(28)
+    except pygame.error as e:
+        print(f"加载字体失败: {e}. 游戏可能无法正确显示文本。")
+
+
+_LAZY_RESOURCES = {
+    "bundle": _load_bundle,
+    "move_sound": _load_move_sound,
+    "CHINESE_FONT_PATH": _load_fonts,
+    "FONT_LARGE": _load_fonts,
+    "FONT_MEDIUM": _load_fonts,
+    "FONT_SMALL": _load_fonts,
+    "FONT_BUTTON": _load_fonts,
+}
 
 # --- Optional: Function to load all assets ---
-def load_all_assets():
-    """Calls all asset loading functions."""
+def load_all_assets(levels_path=LEVELS_DIR):
+    """Calls all asset loading functions. `levels_path` is a level directory or a collection file."""
     print("--- 开始加载所有资源 ---")
     load_images()
-    load_levels_from_disk()
-    # Sounds and fonts are loaded at module import time due to current structure
-    # If preferred, their loading blocks can be wrapped in functions and called here.
-    # For example, move_sound loading, initial BGM, and font object loading.
-    # For now, they load when loader.py is imported.
+    load_levels_from_disk(levels_path)
+    # The move sound and fonts load on first use (see "Lazy resources" above)
     print("--- 所有资源加载尝试完毕 ---")
 
 if __name__ == '__main__':
     # This block can be used for testing the loader module independently
     print("loader.py executed directly. Attempting to load all assets...")
+    pygame.init()
     load_all_assets()
+    _load_move_sound() # Bare names below are plain global lookups, so load the lazy resources up front
+    _load_fonts()
     
     print("\n--- 测试加载结果 ---")
     print(f"图片数量: {len(IMAGES)}")
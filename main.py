@@ -1,6 +1,7 @@
 import pygame
 import os
 import sys
+from text_cache import render_text
 
 # --- 常量定义 ---
 INITIAL_SCREEN_WIDTH = 800
@@ -335,7 +336,7 @@ def undo_last_move():
 
 
 def draw_text(text, font, color, surface, x, y, centered=False):
-    text_surface = font.render(text, True, color)
+    text_surface = render_text(font, text, color)  # 复用已渲染的文字表面
     text_rect = text_surface.get_rect()
     if centered:
         text_rect.center = (x, y)
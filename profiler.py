@@ -0,0 +1,79 @@
+import csv
+import json
+import time
+from collections import deque
+
+from constants import PROFILER_WINDOW, PROFILER_TRACE_LIMIT
+import text_cache
+
+# --- Frame-time profiler ---
+# Game.run calls start_frame(), then lap(phase) after each phase of the loop;
+# lap() charges the time since the previous lap to that phase. ui.py laps the
+# board and HUD parts of draw_game_screen through its `profiler` hook. When
+# profiling is off the hooks are None, so the only cost is an `if` per phase.
+
+PHASES = ("events", "update", "render_board", "render_hud", "render_other", "overlay", "flip")
+TRACE_FIELDS = ["frame", "time_ms"] + [f"{phase}_us" for phase in PHASES] + ["total_us", "text_renders"]
+
+
+class FrameProfiler:
+    """Per-phase frame timings: rolling percentiles over the last PROFILER_WINDOW frames plus a full trace."""
+
+    def __init__(self, window=PROFILER_WINDOW, trace_limit=PROFILER_TRACE_LIMIT):
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES + ("total",)}
+        self.trace = []
+        self.trace_limit = trace_limit
+        self.frames = 0
+        self._created = time.perf_counter_ns()
+        self._current = None
+        self._started = self._last = 0
+        self._text_misses = 0
+
+    def start_frame(self):
+        self._current = dict.fromkeys(PHASES, 0)
+        self._started = self._last = time.perf_counter_ns()
+        self._text_misses = text_cache.misses
+
+    def lap(self, phase):
+        """Charges the time since the previous lap (or start_frame) to `phase`."""
+        now = time.perf_counter_ns()
+        if self._current is not None:
+            self._current[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        """Records the frame started by start_frame(). Only frames that were actually drawn are recorded."""
+        if self._current is None:
+            return
+        total = self._last - self._started
+        for phase, ns in self._current.items():
+            self.samples[phase].append(ns)
+        self.samples["total"].append(total)
+        self.frames += 1
+        if len(self.trace) < self.trace_limit:
+            self.trace.append(
+                [self.frames, round((self._started - self._created) / 1e6, 3)]
+                + [ns // 1000 for ns in self._current.values()]
+                + [total // 1000, text_cache.misses - self._text_misses]
+            )
+        self._current = None
+
+    def percentiles(self, phase):
+        """(p50, p95, p99) in milliseconds over the rolling window, or None before the first frame."""
+        values = sorted(self.samples[phase])
+        if not values:
+            return None
+        last = len(values) - 1
+        return tuple(values[int(last * q + 0.5)] / 1e6 for q in (0.50, 0.95, 0.99))
+
+    def dump(self, path):
+        """Writes the trace as JSON, or as CSV when `path` ends in .csv."""
+        if path.lower().endswith(".csv"):
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(TRACE_FIELDS)
+                writer.writerows(self.trace)
+        else:
+            summary = {phase: self.percentiles(phase) for phase in self.samples}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"fields": TRACE_FIELDS, "frames": self.trace, "percentiles_ms": summary}, f)
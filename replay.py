@@ -0,0 +1,218 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Render with the SDL dummy drivers: no window, no real-time loop
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None # GIF/APNG output needs Pillow; PNG sequences only need pygame
+
+from constants import LEVELS_DIR
+from board import Board, DIRECTION_CHARS, apply_lurd, list_level_files, read_level_file
+import loader
+import game_logic
+import ui
+
+# --- Replay export ---
+# Usage: python replay.py LEVEL MOVES [-o out.gif | out.png | frames_dir] [--workers N]
+#        python replay.py --report solve_report.json -o videos_dir [--format gif]
+# LEVEL is a level file or a 1-based level number; MOVES is a LURD string (or a
+# file holding one). Frame k shows the board after k moves, drawn offscreen with
+# ui.draw_game_screen exactly as the game draws it. The frames are split into
+# ranges of --chunk frames, each rendered (and PNG-encoded or quantized) by a
+# worker process. --report exports every solved level of a batch_solve report.
+
+DEFAULT_FPS = 8
+DEFAULT_CHUNK = 60 # Frames per worker job
+FINAL_FRAME_HOLD_MS = 1500 # The solved position stays on screen a little longer
+ANIMATION_FORMATS = {".gif": "gif", ".png": "apng", ".apng": "apng"}
+
+# fork keeps the workers from re-importing the caller's __main__; spawn is the fallback
+_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def clean_moves(moves):
+    """Keeps only the LURD letters of `moves` (uppercase pushes stay uppercase)."""
+    return "".join(ch for ch in moves if ch.lower() in DIRECTION_CHARS)
+
+
+def playable_moves(level_map, moves):
+    """The longest prefix of `moves` that can be played on `level_map` (apply_lurd stops at a blocked move)."""
+    moves = clean_moves(moves)
+    return moves[:apply_lurd(Board(level_map), moves)]
+
+
+def output_format(output):
+    """'gif' or 'apng' for single-file outputs, 'png' (a directory of frame_NNNNN.png) otherwise."""
+    return ANIMATION_FORMATS.get(os.path.splitext(output)[1].lower(), "png")
+
+
+def _init_worker():
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1)) # convert() needs a display mode, even the dummy one
+    if not loader.IMAGES:
+        loader.load_images()
+
+
+def _render_job(job):
+    """
+    Worker entry point: renders frames [start, stop) of a replay. PNG frames are
+    written to the output directory (returns the count); animation frames are
+    returned as Pillow images, already quantized for GIF.
+    """
+    level_map, level_number, total, moves, start, stop, output, fmt = job
+    _init_worker()
+    board = Board(level_map)
+    width, height = game_logic.window_size(board)
+    surface = pygame.Surface((width, height))
+    # The camera follows the player with a margin, so it depends on the path: replay it from move 0
+    ui.update_camera(board)
+    for ch in moves[:start]:
+        board.step(DIRECTION_CHARS.index(ch.lower()))
+        ui.update_camera(board)
+
+    frames = []
+    for k in range(start, stop):
+        if k > start:
+            board.step(DIRECTION_CHARS.index(moves[k - 1].lower()))
+            ui.update_camera(board)
+        state = "level_complete" if k == len(moves) and board.is_solved() else "playing"
+        ui.draw_game_screen(surface, board, level_number, total, width, height, state,
+                            False, f"步数: {k}/{len(moves)}")
+        if fmt == "png":
+            pygame.image.save(surface, os.path.join(output, f"frame_{k:05d}.png"))
+        else:
+            image = Image.frombytes("RGB", (width, height), pygame.image.tobytes(surface, "RGB"))
+            frames.append(image.quantize() if fmt == "gif" else image)
+    return stop - start if fmt == "png" else frames
+
+
+def _write_animation(output, fmt, frames, fps):
+    durations = [1000 // fps] * (len(frames) - 1) + [FINAL_FRAME_HOLD_MS]
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    frames[0].save(output, format="GIF" if fmt == "gif" else "PNG", save_all=True,
+                   append_images=frames[1:], duration=durations, loop=0)
+
+
+def export_replays(replays, workers=None, fps=DEFAULT_FPS, chunk=DEFAULT_CHUNK):
+    """
+    Renders each replay (level_map, moves, output, level_number, total) to `output`
+    with one process pool shared by all of them. Moves that cannot be played are cut off.
+    Returns [(output, frame count)] in the order given.
+    """
+    jobs = []
+    for level_map, moves, output, level_number, total in replays:
+        moves = playable_moves(level_map, moves)
+        fmt = output_format(output)
+        if fmt == "png":
+            os.makedirs(output, exist_ok=True)
+        count = len(moves) + 1
+        ranges = [(start, min(start + chunk, count)) for start in range(0, count, chunk)]
+        jobs.append((output, fmt, count,
+                     [(level_map, level_number, total, moves, start, stop, output, fmt) for start, stop in ranges]))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD)) as pool:
+        # Everything is queued up front so the workers stay busy while finished replays are assembled
+        futures = [[pool.submit(_render_job, job) for job in level_jobs] for _, _, _, level_jobs in jobs]
+        for (output, fmt, count, _), level_futures in zip(jobs, futures):
+            if fmt == "png":
+                for future in level_futures:
+                    future.result()
+            else:
+                _write_animation(output, fmt, [frame for future in level_futures for frame in future.result()], fps)
+            results.append((output, count))
+    return results
+
+
+def _read_report(path):
+    """Rows of a batch_solve report (.json or .csv)."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith(".csv"):
+            return list(csv.DictReader(f))
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把关卡的 LURD 解法离线渲染为 PNG 序列或 GIF/APNG 动画")
+    parser.add_argument("level", nargs="?", help="关卡文件，或从 1 开始的关卡编号")
+    parser.add_argument("moves", nargs="?", help="LURD 步骤字符串，或包含它的文件")
+    parser.add_argument("--report", help="batch_solve 生成的报告：导出其中所有已解出的关卡")
+    parser.add_argument("--levels-dir", default=LEVELS_DIR)
+    parser.add_argument("-o", "--output", help="输出：.gif / .png (APNG) 文件或 PNG 序列目录；--report 时为目录")
+    parser.add_argument("--format", choices=["gif", "apng", "png"], help="--report 时的输出格式 (默认: 有 Pillow 时为 gif)")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="每个任务渲染的帧数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数 (默认: CPU 核数)")
+    args = parser.parse_args(argv)
+
+    level_files = [os.path.abspath(path) for path in list_level_files(args.levels_dir)]
+    total = max(len(level_files), 1)
+
+    def level_number(path): # For the HUD's "关卡: n/total"
+        path = os.path.abspath(path)
+        return level_files.index(path) if path in level_files else 0
+
+    replays = []
+    if args.report:
+        fmt = args.format or ("gif" if Image is not None else "png")
+        out_dir = args.output or "replays"
+        for row in _read_report(args.report):
+            path = os.path.join(args.levels_dir, row["file"])
+            if not row.get("solution") or not os.path.isfile(path):
+                continue
+            stem = os.path.splitext(row["file"])[0]
+            output = os.path.join(out_dir, stem if fmt == "png" else f"{stem}.{'gif' if fmt == 'gif' else 'png'}")
+            replays.append((read_level_file(path), row["solution"], output, level_number(path), total))
+    elif args.level and args.moves:
+        if os.path.isfile(args.level):
+            path = args.level
+        elif args.level.isdigit() and 1 <= int(args.level) <= len(level_files):
+            path = level_files[int(args.level) - 1]
+        else:
+            print(f"错误：关卡 '{args.level}' 未找到。")
+            return 1
+        moves = args.moves
+        if os.path.isfile(moves):
+            with open(moves, 'r', encoding='utf-8') as f:
+                moves = f.read()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = args.output or (f"replay_{stem}.gif" if Image is not None else f"replay_{stem}")
+        replays.append((read_level_file(path), moves, output, level_number(path), total))
+    else:
+        parser.error("需要 LEVEL 和 MOVES，或 --report")
+
+    if Image is None and any(output_format(output) != "png" for _, _, output, _, _ in replays):
+        print("错误：GIF/APNG 输出需要 Pillow (pip install pillow)；可改为输出 PNG 序列目录。")
+        return 1
+    if not replays:
+        print("没有可导出的解法。")
+        return 0
+
+    started = time.perf_counter()
+    for level_map, moves, output, _, _ in replays:
+        playable = playable_moves(level_map, moves)
+        if len(playable) < len(clean_moves(moves)):
+            print(f"警告：'{output}' 的解法在第 {len(playable) + 1} 步受阻，只导出前 {len(playable)} 步。")
+    results = export_replays(replays, args.workers, args.fps, args.chunk)
+    for output, count in results:
+        print(f"{output}: {count} 帧")
+    print(f"完成: {len(results)} 个回放，{sum(count for _, count in results)} 帧，"
+          f"用时 {time.perf_counter() - started:.2f}s。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,593 @@
+import heapq
+import random
+import sys
+import time
+from collections import deque
+
+from constants import LEVELS_DIR
+from board import (
+    Board, DIRECTION_CHARS, MOVE_PUSH, S_BLOCKED, S_GOAL,
+    list_level_files, read_level_file, apply_lurd
+)
+from deadlock import push_distances, dead_squares, is_freeze_deadlock
+
+# --- Push-based Sokoban solver ---
+# States are (box layout, player region). Pushes are generated and applied with
+# Board.step(), the same rules the game uses, so solver and game cannot disagree.
+# Every solution is replayed on a fresh board before it is reported.
+# Pushes onto dead squares, into freeze deadlocks and away from a PI-corral are
+# pruned, and a goal room behind one entrance is filled by macro moves.
+
+INF = float("inf")
+
+# Result status values
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+NODE_LIMIT = "node_limit"
+MEMORY_LIMIT = "memory_limit"
+TIME_LIMIT = "time_limit"
+CANCELLED = "cancelled"
+
+DEFAULT_MAX_NODES = 2_000_000
+DEFAULT_MAX_STATES = 4_000_000 # Transposition table entries (the memory budget)
+DEFAULT_TIME_LIMIT = 60.0 # Seconds
+
+ZOBRIST_SEED = 0x5EED
+
+
+class SolveResult:
+    """Outcome of a solve() call."""
+    __slots__ = ("status", "solution", "pushes", "nodes", "elapsed")
+
+    def __init__(self, status, solution=None, pushes=0, nodes=0, elapsed=0.0):
+        self.status = status
+        self.solution = solution # LURD string, uppercase letters are pushes
+        self.pushes = pushes
+        self.nodes = nodes # Nodes expanded
+        self.elapsed = elapsed # Seconds
+
+    @property
+    def solved(self):
+        return self.status == SOLVED
+
+    @property
+    def moves(self):
+        return len(self.solution) if self.solution else 0
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (f"SolveResult({self.status}, moves={self.moves}, pushes={self.pushes}, "
+                f"nodes={self.nodes}, {self.nodes_per_second:.0f} nodes/s)")
+
+
+class _BudgetExceeded(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class _Search:
+    """Per-level tables shared by the A* and IDA* drivers."""
+
+    def __init__(self, board, max_nodes, max_states, time_limit, cancel=None):
+        self.board = board
+        self.cancel = cancel
+        self.max_nodes = max_nodes
+        self.max_states = max_states
+        self.deadline = time.perf_counter() + time_limit if time_limit else INF
+        self.nodes = 0
+
+        size = len(board.static)
+        rng = random.Random(ZOBRIST_SEED)
+        self.box_keys = [rng.getrandbits(64) for _ in range(size)]
+        self.player_keys = [rng.getrandbits(64) for _ in range(size)]
+        self.distances = push_distances(board)
+        self.dead = dead_squares(board, self.distances)
+        self.blocked = blocked_mask(board)
+        # Goal room macro (see goal_room): None, or (entrance, room mask, fill order, push distances
+        # to the entrance, pushes left to fill the room after k boxes are packed)
+        self.packing = None
+        room = goal_room(board)
+        if room is not None:
+            order = packing_order(board, *room)
+            if order is not None:
+                # Exact room cost: each box is pushed onto the entrance, then along its goal's route
+                to_entrance = push_distances(board, (room[0],))
+                routes = [min(len(pushes) for pushes in routes.values()) for _, routes in order]
+                remaining = [sum(routes[k:]) for k in range(len(order) + 1)]
+                self.packing = (room[0], room[1], order, to_entrance, remaining)
+
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _BudgetExceeded(NODE_LIMIT)
+        if self.nodes & 255 == 0:
+            if time.perf_counter() > self.deadline:
+                raise _BudgetExceeded(TIME_LIMIT)
+            if self.cancel is not None and self.cancel():
+                raise _BudgetExceeded(CANCELLED)
+
+    def heuristic(self, boxes):
+        """
+        Sum of each box's push distance to its nearest goal (INF if a box can never reach one).
+        With a goal room: the distance to the entrance plus the routes of the goals still empty.
+        """
+        if self.packing is None:
+            distances = self.distances
+            return sum(distances[b] for b in boxes)
+        _, room, _, to_entrance, remaining = self.packing
+        h = packed = 0
+        for b in boxes:
+            if room[b]:
+                packed += 1
+            else:
+                h += to_entrance[b]
+        return h + remaining[min(packed, len(remaining) - 1)]
+
+    def box_hash(self, boxes):
+        box_keys = self.box_keys
+        h = 0
+        for b in boxes:
+            h ^= box_keys[b]
+        return h
+
+    def corral(self, boxes, seen):
+        """
+        The boxes to push first because of a PI-corral, or None. A corral is an
+        area the player cannot reach (see reachable's `seen`). It is a PI-corral
+        when every push of a box on its edge goes into it, and the player can
+        make each of those pushes now. Its boxes must move before anything can
+        change inside it, so if it holds a box off a goal or an empty goal, only
+        pushes of its edge boxes are needed.
+        """
+        board = self.board
+        static, dynamic, offsets = board.static, board.dynamic, board.offsets
+        room = self.packing[1] if self.packing else None
+        edge = {b for b in boxes if any(seen[b + off] == 1 for off in offsets)}
+        area = bytearray(len(static)) # Corral number of each unreachable cell
+        best, best_pushes = None, INF
+        number = 0
+        for start in range(len(static)):
+            if seen[start] or area[start] or dynamic[start]:
+                continue
+            number += 1
+            area[start] = number
+            stack = [start]
+            unfinished = False
+            boundary = set()
+            while stack:
+                cell = stack.pop()
+                if bool(dynamic[cell]) != bool(static[cell] & S_GOAL):
+                    unfinished = True
+                for off in offsets:
+                    n = cell + off
+                    if n in edge:
+                        boundary.add(n)
+                    elif not seen[n] and not area[n]:
+                        area[n] = number
+                        stack.append(n)
+            if not unfinished and all(static[b] & S_GOAL for b in boundary):
+                continue
+            pushes = 0
+            for b in boundary:
+                if room and room[b]:
+                    break # Packed boxes are never pushed
+                for off in offsets:
+                    n, p = b + off, b - off
+                    if static[n] & S_BLOCKED or dynamic[n]:
+                        continue # No push this way
+                    if area[n] == number:
+                        if seen[p] != 1:
+                            break # P fails: a push into the corral the player cannot make now
+                        pushes += 1
+                    elif not static[p] & S_BLOCKED and area[p] != number:
+                        break # I fails: a push out of the corral (dead squares included), now or later
+                else:
+                    continue
+                break
+            else:
+                if 0 < pushes < best_pushes:
+                    best, best_pushes = boundary, pushes
+        return best
+
+    def successors(self, boxes, seen):
+        """
+        Yields (box_from, box_to, pushes) for every push the player can make
+        from the reachable region `seen`, skipping pushes onto dead squares or
+        into freeze deadlocks. `pushes` is ((box_from, direction),), or the
+        whole goal room macro for a push onto its entrance. The pushes are
+        applied to the board (via Board.step) while the caller looks at them,
+        and undone afterwards.
+        """
+        board = self.board
+        offsets = board.offsets
+        dead = self.dead
+        entrance, room, order = self.packing[:3] if self.packing else (-1, None, ())
+        packed = sum(room[b] for b in boxes) if room else 0
+        for b in self.corral(boxes, seen) or boxes:
+            if room and room[b]:
+                continue # Packed boxes stay on their goals
+            for d in range(4):
+                off = offsets[d]
+                if seen[b - off] != 1 or dead[b + off]:
+                    continue
+                board.player = b - off
+                if board.step(d) != MOVE_PUSH:
+                    continue
+                if b + off == entrance:
+                    route = order[packed][1].get(b) if packed < len(order) else None
+                    if route is None:
+                        board.undo_step(d, True)
+                        continue
+                    for box_from, push_d in route:
+                        board.player = box_from - offsets[push_d]
+                        board.step(push_d)
+                    yield b, order[packed][0], ((b, d),) + route
+                    for box_from, push_d in reversed(route):
+                        board.player = box_from
+                        board.undo_step(push_d, True)
+                    board.player = b
+                    board.undo_step(d, True)
+                    continue
+                if is_freeze_deadlock(board, b + off, dead):
+                    board.undo_step(d, True)
+                    continue
+                yield b, b + off, ((b, d),)
+                board.undo_step(d, True)
+
+
+# --- Goal room packing ---
+# Many levels keep every goal in one room that the rest of the level enters
+# through a single cell. Boxes can then be packed one at a time, in an order
+# that never blocks a later goal: a push onto the entrance continues straight
+# to the next goal in that order as one macro move, and packed boxes are never
+# pushed again. The search never looks at box arrangements inside the room.
+# This can miss solutions that park a box in the room, so solve() repeats an
+# exhausted search without it before reporting a level unsolvable.
+
+def goal_room(board):
+    """
+    (entrance, room mask) for the smallest area holding every goal, but no box
+    and not the player, that the rest of the level reaches only through the
+    entrance cell. None if the level has no such room.
+    """
+    static, dynamic, offsets = board.static, board.dynamic, board.offsets
+    if not board.goals or board.player < 0:
+        return None
+    best, best_size = None, INF
+    for entrance, flags in enumerate(static):
+        if flags & (S_BLOCKED | S_GOAL) or dynamic[entrance]:
+            continue
+        room = bytearray(len(static))
+        room[board.goals[0]] = 1
+        stack = [board.goals[0]]
+        size = 1
+        while stack and size < best_size:
+            cell = stack.pop()
+            for off in offsets:
+                n = cell + off
+                if not room[n] and n != entrance and not static[n] & S_BLOCKED:
+                    if dynamic[n] or n == board.player:
+                        stack = None # Not closed off from the boxes: no room behind this cell
+                        break
+                    room[n] = 1
+                    size += 1
+                    stack.append(n)
+            if stack is None:
+                break
+        if stack == [] and size < best_size and all(room[g] for g in board.goals):
+            best, best_size = (entrance, bytes(room)), size
+    return best
+
+
+def packing_order(board, entrance, room):
+    """
+    Fill order for a goal room: [(goal, routes)], where routes maps each cell the
+    player can push from into the entrance to the pushes taking that box on to
+    the goal, with the earlier goals already filled. None if no order is found.
+    Built in reverse: from a full room, boxes are pulled out one at a time,
+    nearest the entrance first.
+    """
+    walk = {entrance: 0} # Walking distance from the entrance through the room
+    queue = deque([entrance])
+    while queue:
+        cell = queue.popleft()
+        for off in board.offsets:
+            n = cell + off
+            if room[n] and n not in walk:
+                walk[n] = walk[cell] + 1
+                queue.append(n)
+    filled = set(board.goals)
+    order = []
+    while filled:
+        for goal in sorted(filled, key=lambda g: (walk.get(g, INF), g)):
+            routes = _pull_out(board, entrance, room, goal, filled - {goal})
+            if routes:
+                order.append((goal, routes))
+                filled.remove(goal)
+                break
+        else:
+            return None
+    order.reverse()
+    return order
+
+
+def _pull_out(board, entrance, room, goal, obstacles):
+    """
+    {outside cell: pushes} for pulling a box from `goal` to `entrance` around the
+    boxes on `obstacles`, until the player stands on that cell outside the entrance.
+    The pushes are the forward (box_from, direction) moves, entrance to goal.
+    The player stays in the room, so the rest of the level cannot get in the way.
+    """
+    static, offsets = board.static, board.offsets
+    routes = {}
+    for outside in (entrance + off for off in offsets):
+        if room[outside] or static[outside] & S_BLOCKED:
+            continue
+
+        def free(cell):
+            return (room[cell] or cell == entrance or cell == outside) and cell not in obstacles
+
+        # BFS over (box, player); parent links keep only the pulls
+        start = [(goal, goal - off) for off in offsets if free(goal - off)]
+        parent = dict.fromkeys(start)
+        queue = deque(start)
+        while queue:
+            state = queue.popleft()
+            box, player = state
+            if box == entrance and player == outside:
+                pushes = []
+                while parent[state] is not None:
+                    state, push = parent[state]
+                    if push is not None:
+                        pushes.append(push)
+                routes[outside] = tuple(pushes)
+                break
+            for d, off in enumerate(offsets):
+                n = player + off
+                if n == box or not free(n):
+                    continue
+                if (box, n) not in parent:
+                    parent[(box, n)] = (state, None)
+                    queue.append((box, n))
+                # Pull: the player steps away from an adjacent box, which follows it
+                if player - off == box and player != outside:
+                    pulled = (player, n)
+                    if pulled not in parent:
+                        parent[pulled] = (state, (player, d ^ 2)) # Forward: push from `player` back towards `box`
+                        queue.append(pulled)
+    return routes
+
+
+def blocked_mask(board):
+    """Per-cell mask with 2 on walls/void and 0 elsewhere, the starting point for reachable()."""
+    return bytes(2 if flags & S_BLOCKED else 0 for flags in board.static)
+
+
+def reachable(board, blocked=None):
+    """
+    Flood-fills the cells the player can walk to without pushing.
+    Returns (seen, lowest_cell): a mask with 1 on reachable cells, and the
+    normalized player position used in transposition keys.
+    """
+    if blocked is None:
+        blocked = blocked_mask(board)
+    dynamic = board.dynamic
+    o0, o1, o2, o3 = board.offsets
+    start = board.player
+    seen = bytearray(blocked)
+    seen[start] = 1
+    stack = [start]
+    pop, push = stack.pop, stack.append
+    lowest = start
+    while stack:
+        cell = pop()
+        for n in (cell + o0, cell + o1, cell + o2, cell + o3):
+            if not seen[n] and not dynamic[n]:
+                seen[n] = 1
+                push(n)
+                if n < lowest:
+                    lowest = n
+    return seen, lowest
+
+
+def _walk_path(board, target):
+    """Shortest non-pushing walk from the player to `target`, as lowercase LURD."""
+    static, dynamic, offsets = board.static, board.dynamic, board.offsets
+    start = board.player
+    if start == target:
+        return ""
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for d, off in enumerate(offsets):
+            n = cell + off
+            if n in came_from or static[n] & S_BLOCKED or dynamic[n]:
+                continue
+            came_from[n] = (cell, d)
+            if n == target:
+                path = []
+                while came_from[n] is not None:
+                    n, step_d = came_from[n]
+                    path.append(DIRECTION_CHARS[step_d])
+                return ''.join(reversed(path))
+            queue.append(n)
+    return None
+
+
+def pushes_to_lurd(board, pushes):
+    """Expands a list of (box_from, direction) pushes into a full LURD string, starting from `board`."""
+    board = board.copy()
+    parts = []
+    for box_from, d in pushes:
+        walk = _walk_path(board, box_from - board.offsets[d])
+        if walk is None:
+            return None
+        apply_lurd(board, walk)
+        board.step(d)
+        parts.append(walk)
+        parts.append(DIRECTION_CHARS[d].upper())
+    return ''.join(parts)
+
+
+def _astar(search, weight, max_states):
+    board = search.board
+    start_boxes = tuple(board.box_cells())
+    start_h = search.heuristic(start_boxes)
+    if start_h == INF:
+        return None
+    _, start_low = reachable(board, search.blocked)
+    start_hash = search.box_hash(start_boxes)
+    start_key = start_hash ^ search.player_keys[start_low]
+
+    # Transposition table: key -> [g, parent_key, pushes, boxes, box_hash, player]
+    table = {start_key: [0, None, None, start_boxes, start_hash, board.player]}
+    heap = [(start_h * weight, 0, start_key)] # (f, -g, key): deeper nodes first on ties
+
+    while heap:
+        _, neg_g, key = heapq.heappop(heap)
+        g = -neg_g
+        entry = table[key]
+        if g > entry[0]:
+            continue # Stale heap entry
+        boxes, box_hash = entry[3], entry[4]
+        board.set_boxes(boxes)
+        board.player = entry[5]
+        if board.is_solved():
+            steps = []
+            while entry[1] is not None:
+                steps.append(entry[2])
+                entry = table[entry[1]]
+            return [push for pushes in reversed(steps) for push in pushes]
+
+        search.count_node()
+        seen, _ = reachable(board, search.blocked)
+        for b, nb, pushes in search.successors(boxes, seen):
+            child_boxes = tuple(sorted(nb if x == b else x for x in boxes))
+            child_hash = box_hash ^ search.box_keys[b] ^ search.box_keys[nb]
+            _, child_low = reachable(board, search.blocked)
+            child_key = child_hash ^ search.player_keys[child_low]
+            child_g = g + len(pushes)
+            known = table.get(child_key)
+            if known is not None and known[0] <= child_g:
+                continue
+            if known is None and len(table) >= max_states:
+                raise _BudgetExceeded(MEMORY_LIMIT)
+            table[child_key] = [child_g, key, pushes, child_boxes, child_hash, board.player]
+            child_h = search.heuristic(child_boxes)
+            heapq.heappush(heap, (child_g + child_h * weight, -child_g, child_key))
+    return None
+
+
+def _ida(search, max_states):
+    board = search.board
+    boxes = board.box_cells()
+    start_h = search.heuristic(boxes)
+    if start_h == INF:
+        return None
+    path = [] # Push tuples from successors, one per step
+
+    def dfs(g, h, box_hash, bound, table):
+        f = g + h
+        if f > bound:
+            return f
+        if board.is_solved():
+            return True
+        seen, low = reachable(board, search.blocked)
+        key = box_hash ^ search.player_keys[low]
+        if table.get(key, INF) <= g:
+            return INF
+        if len(table) >= max_states:
+            raise _BudgetExceeded(MEMORY_LIMIT)
+        table[key] = g
+        search.count_node()
+
+        player = board.player
+        next_bound = INF
+        for b, nb, pushes in search.successors(tuple(boxes), seen):
+            slot = boxes.index(b)
+            boxes[slot] = nb
+            path.append(pushes)
+            result = dfs(g + len(pushes), search.heuristic(boxes),
+                         box_hash ^ search.box_keys[b] ^ search.box_keys[nb], bound, table)
+            if result is True:
+                return True
+            path.pop()
+            boxes[slot] = b
+            if result < next_bound:
+                next_bound = result
+        board.player = player
+        return next_bound
+
+    bound = start_h
+    start_hash = search.box_hash(boxes)
+    while True:
+        result = dfs(0, start_h, start_hash, bound, {})
+        if result is True:
+            return [push for pushes in path for push in pushes]
+        if result == INF:
+            return None
+        bound = result
+
+
+def solve(level, method="astar", max_nodes=DEFAULT_MAX_NODES, max_states=DEFAULT_MAX_STATES,
+          time_limit=DEFAULT_TIME_LIMIT, weight=1.0, cancel=None):
+    """
+    Solves a level (a level map from loader.levels, or a Board).
+    method: "astar" (push-optimal when weight is 1.0, except that boxes are
+    packed into a goal room one by one, see goal_room) or "ida" (low memory).
+    Budgets: max_nodes expanded, max_states transposition table entries, time_limit seconds.
+    cancel: optional callable polled during the search; returning True stops it.
+    Returns a SolveResult.
+    """
+    start_board = level.copy() if isinstance(level, Board) else Board(level)
+    if start_board.player < 0:
+        return SolveResult(UNSOLVABLE)
+    board = start_board.copy() # The search mutates its own copy
+
+    started = time.perf_counter()
+    search = _Search(board, max_nodes, max_states, time_limit, cancel)
+    try:
+        if method == "ida":
+            sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+        while True:
+            pushes = _ida(search, max_states) if method == "ida" else _astar(search, weight, max_states)
+            if pushes is not None or search.packing is None:
+                break
+            # Packing found nothing: search again without it, from the start, on the same budget
+            search.packing = None
+            search.board = start_board.copy()
+    except _BudgetExceeded as e:
+        return SolveResult(e.status, nodes=search.nodes, elapsed=time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+
+    if pushes is None:
+        return SolveResult(UNSOLVABLE, nodes=search.nodes, elapsed=elapsed)
+    solution = pushes_to_lurd(start_board, pushes)
+    if solution is None or not verify_solution(start_board, solution):
+        raise RuntimeError("solver produced a solution the game rules reject")
+    return SolveResult(SOLVED, solution, len(pushes), search.nodes, elapsed)
+
+
+def verify_solution(level, solution):
+    """Replays a LURD solution with the game rules and checks that it solves the level."""
+    board = level.copy() if isinstance(level, Board) else Board(level)
+    moves = sum(1 for char in solution if char.lower() in DIRECTION_CHARS)
+    return apply_lurd(board, solution) == moves and board.is_solved()
+
+
+if __name__ == '__main__':
+    # Usage: python solver.py [level numbers...] [--ida]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    method = "ida" if "--ida" in sys.argv else "astar"
+    level_files = list_level_files(LEVELS_DIR)
+    numbers = [int(a) for a in args] if args else range(1, len(level_files) + 1)
+    for n in numbers:
+        result = solve(read_level_file(level_files[n - 1]), method=method)
+        print(f"关卡 {n}: {result}")
+        if result.solved:
+            print(f"  {result.solution}")
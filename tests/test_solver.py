@@ -0,0 +1,46 @@
+import os
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import Board, S_BLOCKED
+import generator
+import solver
+
+
+def bfs_pushes(level_map):
+    """Fewest pushes that solve the level, by breadth-first search over (box layout, player region)."""
+    board = Board(level_map)
+    blocked = solver.blocked_mask(board)
+    start = (tuple(board.box_cells()), solver.reachable(board, blocked)[1])
+    seen = {start}
+    queue = deque([(start, 0)])
+    while queue:
+        (boxes, player), pushes = queue.popleft()
+        board.set_boxes(boxes)
+        board.player = player
+        if board.is_solved():
+            return pushes
+        area, _ = solver.reachable(board, blocked)
+        for b in boxes:
+            for d, off in enumerate(board.offsets):
+                if area[b - off] != 1 or board.static[b + off] & S_BLOCKED or board.dynamic[b + off]:
+                    continue
+                board.player = b - off
+                board.step(d)
+                child = (tuple(sorted(b + off if x == b else x for x in boxes)), solver.reachable(board, blocked)[1])
+                board.undo_step(d, True)
+                if child not in seen:
+                    seen.add(child)
+                    queue.append((child, pushes + 1))
+    return None
+
+
+def test_corral_pruning_keeps_push_optimal_solution():
+    # A box whose only push from the player's side lands on a dead square used to pass as a PI-corral edge
+    level_map = [list(line) for line in generator.generate_candidate(104, 7, 8, 3, 80)]
+    result = solver.solve(level_map)
+    assert result.solved
+    assert result.pushes == bfs_pushes(level_map) == 4
+    assert solver.verify_solution(Board(level_map), result.solution)
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+from constants import TEXT_CACHE_SIZE
+
+# --- Rendered text cache ---
+# font.render rasterizes every glyph on each call, which is slow for
+# anti-aliased CJK text. Surfaces are kept in a bounded LRU keyed by
+# (text, font, color, antialias), so steady-state frames only blit.
+# Cached surfaces are shared: callers must blit them, never draw on them.
+
+_cache = OrderedDict()
+hits = 0
+misses = 0
+
+
+def render_text(font, text, color, antialias=True):
+    """Returns font.render(text, antialias, color), reusing an earlier surface when possible."""
+    global hits, misses
+    key = (text, font, tuple(color), antialias) # pygame.Color is not hashable
+    surface = _cache.get(key)
+    if surface is not None:
+        hits += 1
+        _cache.move_to_end(key)
+        return surface
+    misses += 1
+    surface = font.render(text, antialias, color)
+    _cache[key] = surface
+    if len(_cache) > TEXT_CACHE_SIZE:
+        _cache.popitem(last=False) # Drop the least recently used entry
+    return surface
+
+
+def cache_stats():
+    """Returns {'hits', 'misses', 'size', 'max_size'} for the text cache."""
+    return {"hits": hits, "misses": misses, "size": len(_cache), "max_size": TEXT_CACHE_SIZE}
+
+
+def clear_text_cache():
+    """Drops every cached surface (e.g. after fonts are reloaded) and resets the counters."""
+    global hits, misses
+    _cache.clear()
+    hits = misses = 0
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from constants import (
+    IMAGES_DIR, IMAGE_FILES, LEVELS_DIR, THUMBNAIL_DIR, THUMBNAIL_SIZE, THUMBNAIL_MEMORY_LIMIT
+)
+from board import Board, S_WALL, S_GOAL, S_VOID, list_level_files, read_level_file, level_hash
+
+# --- Level thumbnails ---
+# Previews are composed from the tile images in worker processes and stored as
+# PNGs in THUMBNAIL_DIR, named by level content hash + tile art + size, so a
+# preview is only ever rendered once. The game asks for the visible menu page;
+# workers read or render the PNG and send back raw RGBA bytes, so the frame
+# loop never decodes, renders or touches the disk.
+# Usage (fill the cache ahead of time): python thumbnails.py [levels_dir] --workers N
+
+# fork keeps the workers from re-importing the game's __main__ (and loader); spawn is the fallback
+_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+_tile_images = {} # Per worker process: {cell_size: {name: Surface}}
+
+
+def art_digest():
+    """Short fingerprint of the tile images, so new art invalidates old thumbnails."""
+    h = hashlib.sha256()
+    for name, filename in sorted(IMAGE_FILES.items()):
+        path = os.path.join(IMAGES_DIR, filename)
+        try:
+            st = os.stat(path)
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        except OSError:
+            h.update(f"{name}:missing;".encode())
+    return h.hexdigest()[:16]
+
+
+def thumbnail_path(digest, art, size=THUMBNAIL_SIZE):
+    return os.path.join(THUMBNAIL_DIR, f"{digest[:32]}_{art}_{size[0]}x{size[1]}.png")
+
+
+def _tiles(cell):
+    """Tile images scaled to `cell` pixels, loaded straight from IMAGES_DIR (no display needed)."""
+    tiles = _tile_images.get(cell)
+    if tiles is None:
+        tiles = {}
+        for name, filename in IMAGE_FILES.items():
+            try:
+                image = pygame.image.load(os.path.join(IMAGES_DIR, filename))
+            except (pygame.error, FileNotFoundError):
+                continue # Missing art just leaves that layer out of the preview
+            tiles[name] = pygame.transform.smoothscale(image, (cell, cell))
+        _tile_images[cell] = tiles
+    return tiles
+
+
+def render_thumbnail(level_map, size=THUMBNAIL_SIZE):
+    """Composes a preview of `level_map` that fits in `size` (transparent outside the map)."""
+    board = Board(level_map)
+    rows, cols = max(board.rows, 1), max(board.cols, 1)
+    cell = max(1, min(size[0] // cols, size[1] // rows))
+    tiles = _tiles(cell)
+    image = pygame.Surface((cols * cell, rows * cell), pygame.SRCALPHA)
+    static, dynamic, width = board.static, board.dynamic, board.width
+    for r in range(board.rows):
+        i = (r + 1) * width + 1
+        for c in range(board.cols):
+            flags = static[i]
+            if not flags & S_VOID:
+                layers = ["goal" if flags & S_GOAL else "floor"]
+                if flags & S_WALL:
+                    layers.append("wall")
+                elif dynamic[i]:
+                    layers.append("box_on_goal" if flags & S_GOAL else "box")
+                if i == board.player:
+                    layers.append("player_on_goal" if flags & S_GOAL else "player")
+                for name in layers:
+                    if name in tiles:
+                        image.blit(tiles[name], (c * cell, r * cell))
+            i += 1
+
+    # Levels with more cells than the preview has pixels are drawn at 1px per cell and scaled down
+    scale = min(size[0] / image.get_width(), size[1] / image.get_height(), 1.0)
+    if scale < 1.0:
+        image = pygame.transform.smoothscale(
+            image, (max(1, int(image.get_width() * scale)), max(1, int(image.get_height() * scale))))
+    thumbnail = pygame.Surface(size, pygame.SRCALPHA)
+    thumbnail.blit(image, ((size[0] - image.get_width()) // 2, (size[1] - image.get_height()) // 2))
+    return thumbnail
+
+
+def _thumbnail_job(job):
+    """Worker entry point: returns the RGBA bytes of a level's thumbnail, rendering it on a cache miss."""
+    level_map, art, size = job
+    path = thumbnail_path(level_hash(level_map), art, size)
+    if os.path.exists(path):
+        try:
+            surface = pygame.image.load(path)
+            if surface.get_size() == tuple(size):
+                return pygame.image.tobytes(surface, "RGBA")
+        except pygame.error:
+            pass # Corrupt file, render it again
+    surface = render_thumbnail(level_map, size)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.png"
+    pygame.image.save(surface, tmp_path)
+    os.replace(tmp_path, path) # Never leave a half-written PNG behind
+    return pygame.image.tobytes(surface, "RGBA")
+
+
+class ThumbnailCache:
+    """Requests thumbnails from a process pool and keeps the decoded ones in a small LRU."""
+
+    def __init__(self, size=THUMBNAIL_SIZE, workers=None, max_loaded=THUMBNAIL_MEMORY_LIMIT):
+        self.size = tuple(size)
+        self.workers = workers
+        self.max_loaded = max_loaded
+        self._art = None
+        self._pool = None
+        self._surfaces = OrderedDict() # level index -> Surface
+        self._pending = {} # level index -> Future
+        self._failed = set()
+
+    @property
+    def pending(self):
+        return bool(self._pending)
+
+    def get(self, level_idx):
+        """Returns the thumbnail Surface if it is already loaded, else None. Never blocks."""
+        surface = self._surfaces.get(level_idx)
+        if surface is not None:
+            self._surfaces.move_to_end(level_idx)
+        return surface
+
+    def request(self, levels, level_indices):
+        """
+        Queues thumbnails for `level_indices` of `levels` (in priority order).
+        Queued jobs for other levels that have not started yet are cancelled.
+        """
+        wanted = set(level_indices)
+        for idx in [i for i in self._pending if i not in wanted]:
+            if self._pending[idx].cancel():
+                del self._pending[idx]
+        for idx in level_indices:
+            if idx in self._surfaces or idx in self._pending or idx in self._failed:
+                continue
+            if self._pool is None:
+                self._art = art_digest()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(_START_METHOD))
+            self._pending[idx] = self._pool.submit(_thumbnail_job, (levels[idx], self._art, self.size))
+
+    def poll(self):
+        """Collects finished jobs without waiting. Returns the level indices whose thumbnails just arrived."""
+        ready = []
+        for idx, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[idx]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"警告：关卡 {idx + 1} 的缩略图生成失败: {e}")
+                self._failed.add(idx)
+                continue
+            surface = pygame.image.frombytes(data, self.size, "RGBA")
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            self._surfaces[idx] = surface
+            if len(self._surfaces) > self.max_loaded:
+                self._surfaces.popitem(last=False)
+            ready.append(idx)
+        return ready
+
+    def shutdown(self):
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._pending.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预先生成关卡缩略图缓存")
+    parser.add_argument("levels_dir", nargs="?", default=LEVELS_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="进程数 (默认: CPU 核数)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.levels_dir):
+        print(f"错误：关卡目录 '{args.levels_dir}' 未找到。")
+        return 1
+    started = time.perf_counter()
+    art = art_digest()
+    jobs = [(read_level_file(path), art, THUMBNAIL_SIZE) for path in list_level_files(args.levels_dir)]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for _ in pool.map(_thumbnail_job, jobs, chunksize=8):
+            pass
+    print(f"完成: {len(jobs)} 个缩略图已写入 '{THUMBNAIL_DIR}'，用时 {time.perf_counter() - started:.2f}s。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
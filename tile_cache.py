@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+import pygame
+
+from constants import TILE_SIZE, TILE_CACHE_MAX_SIZES
+import loader
+
+# --- Scaled tile cache ---
+# loader.IMAGES holds the tiles at TILE_SIZE. Other zoom levels are scaled once
+# from the original art (loader.SOURCE_IMAGES, already in memory) on first use
+# and kept for the TILE_CACHE_MAX_SIZES most recently used sizes.
+
+_variants = OrderedDict() # size -> {name: Surface}
+
+
+def get_tiles(size):
+    """Returns {name: Surface} with every tile image scaled to `size` x `size` pixels."""
+    if size == TILE_SIZE:
+        return loader.IMAGES
+    tiles = _variants.get(size)
+    if tiles is not None:
+        _variants.move_to_end(size)
+        return tiles
+    has_display = pygame.display.get_surface() is not None
+    tiles = {}
+    for name, source in loader.SOURCE_IMAGES.items():
+        image = pygame.transform.smoothscale(source, (size, size))
+        if has_display:
+            image = image.convert_alpha() if source.get_alpha() is not None else image.convert()
+        tiles[name] = image
+    _variants[size] = tiles
+    if len(_variants) > TILE_CACHE_MAX_SIZES:
+        _variants.popitem(last=False) # Drop the least recently used size
+    return tiles
+
+
+def cached_sizes():
+    return [TILE_SIZE] + list(_variants)
+
+
+def clear_tile_cache():
+    """Drops every scaled variant (e.g. after the images are reloaded)."""
+    _variants.clear()
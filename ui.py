@@ -4,17 +4,23 @@ from constants import (
     MENU_BACKGROUND_COLOR, RED, MENU_BUTTON_TEXT_COLOR, LEVELS_DIR, MENU_TITLE_COLOR,
     MENU_BUTTON_COLOR, MENU_BUTTON_HOVER_COLOR, MENU_BUTTON_BORDER_COLOR,
     MENU_BUTTON_SELECTED_BORDER_COLOR, MENU_QUIT_BUTTON_COLOR, MENU_QUIT_BUTTON_HOVER_COLOR,
-    MENU_BORDER_RADIUS, INITIAL_SCREEN_WIDTH, TILE_SIZE, BLACK, GAME_INFO_BG_COLOR,
+    MENU_BORDER_RADIUS, INITIAL_SCREEN_WIDTH, INITIAL_SCREEN_HEIGHT, TILE_SIZE, BLACK, GAME_INFO_BG_COLOR,
     GAME_INFO_TEXT_COLOR, GREEN, WHITE, MENU_BUTTONS_PER_ROW, MENU_BUTTON_WIDTH,
-    MENU_BUTTON_HEIGHT, MENU_BUTTON_PADDING
+    MENU_BUTTON_HEIGHT, MENU_BUTTON_PADDING, MENU_ROWS_PER_PAGE, MENU_BUTTONS_PER_PAGE,
+    MAX_VIEW_COLS, MAX_VIEW_ROWS, CAMERA_MARGIN, MINIMAP_MAX_SIZE, MINIMAP_FLOOR_COLOR, MINIMAP_WALL_COLOR,
+    MINIMAP_GOAL_COLOR, MINIMAP_BOX_COLOR, MINIMAP_BOX_ON_GOAL_COLOR, MINIMAP_PLAYER_COLOR, MINIMAP_VIEW_COLOR,
+    ZOOM_LEVELS
 )
 # Assuming loader.py is in the same directory or accessible via Python path
-from loader import FONT_LARGE, FONT_MEDIUM, FONT_SMALL, FONT_BUTTON, IMAGES, levels
+import loader # Always read through the module: loader.levels is rebound and the fonts load on first access
+from board import S_WALL, S_GOAL, S_VOID
+from text_cache import render_text
+from tile_cache import get_tiles
 
 
 def draw_text(text, font, color, surface, x, y, centered=False):
-    """Renders text onto a surface."""
-    text_surface = font.render(text, True, color)
+    """Renders text onto a surface (through the shared text cache)."""
+    text_surface = render_text(font, text, color)
     text_rect = text_surface.get_rect()
     if centered:
         text_rect.center = (x, y)
@@ -24,18 +30,114 @@ def draw_text(text, font, color, surface, x, y, centered=False):
     return text_rect # Return the rect for potential collision detection or positioning
 
 
-def draw_level_selection_menu(screen_surface, selected_button_idx, current_screen_width, current_screen_height, mouse_pos):
+def draw_menu_button(screen_surface, button_idx, rect, selected_button_idx, mouse_pos, thumbnail=None):
     """
-    Draws the level selection menu. Handles screen resizing.
+    Draws one level-select button (the quit button when button_idx == len(loader.levels)).
+    With a `thumbnail` the level preview fills the button and the number moves to a corner.
+    Can be called on its own to repaint a single button. Returns the button rect.
+    """
+    is_quit = (button_idx == len(loader.levels))
+    is_selected_by_kb = (button_idx == selected_button_idx)
+    is_hovered_by_mouse = rect.collidepoint(mouse_pos)
+
+    if is_quit:
+        btn_color = MENU_QUIT_BUTTON_HOVER_COLOR if is_hovered_by_mouse or is_selected_by_kb else MENU_QUIT_BUTTON_COLOR
+    else:
+        btn_color = MENU_BUTTON_HOVER_COLOR if is_hovered_by_mouse or is_selected_by_kb else MENU_BUTTON_COLOR
+
+    screen_surface.fill(MENU_BACKGROUND_COLOR, rect) # Clear the rounded corners when repainting
+    pygame.draw.rect(screen_surface, btn_color, rect, border_radius=MENU_BORDER_RADIUS)
+    border_color = MENU_BUTTON_SELECTED_BORDER_COLOR if is_selected_by_kb else MENU_BUTTON_BORDER_COLOR
+    pygame.draw.rect(screen_surface, border_color, rect, 2, border_radius=MENU_BORDER_RADIUS)
+    if is_quit:
+        if loader.FONT_SMALL:
+            draw_text("退出游戏", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, rect.centerx, rect.centery, centered=True)
+    elif thumbnail is not None:
+        screen_surface.blit(thumbnail, thumbnail.get_rect(center=rect.center))
+        if loader.FONT_SMALL:
+            label = render_text(loader.FONT_SMALL, str(button_idx + 1), MENU_BUTTON_TEXT_COLOR)
+            badge = label.get_rect(topleft=(rect.x + 4, rect.y + 4)).inflate(6, 0)
+            pygame.draw.rect(screen_surface, btn_color, badge, border_radius=4)
+            screen_surface.blit(label, label.get_rect(center=badge.center))
+    elif loader.FONT_BUTTON:
+        draw_text(str(button_idx + 1), loader.FONT_BUTTON, MENU_BUTTON_TEXT_COLOR, screen_surface, rect.centerx, rect.centery, centered=True)
+    return rect
+
+
+# --- Level-select layout ---
+# The menu keeps a fixed window size and shows MENU_BUTTONS_PER_PAGE levels at a
+# time, so drawing and hit-testing cost the same for 10 levels or 10,000.
+MENU_TITLE_AREA_HEIGHT = 100
+MENU_QUIT_AREA_HEIGHT = 80 # Quit button plus its bottom margin
+MENU_PAGER_HEIGHT = 30 # Page indicator, only when there is more than one page
+_MENU_CELL_W = MENU_BUTTON_WIDTH + MENU_BUTTON_PADDING
+_MENU_CELL_H = MENU_BUTTON_HEIGHT + MENU_BUTTON_PADDING
+
+
+def menu_page_count(num_levels):
+    return max(1, (num_levels + MENU_BUTTONS_PER_PAGE - 1) // MENU_BUTTONS_PER_PAGE)
+
+
+def menu_window_size(num_levels):
+    """Window size for the menu; it only depends on how many rows the first page uses."""
+    rows = min((num_levels + MENU_BUTTONS_PER_ROW - 1) // MENU_BUTTONS_PER_ROW, MENU_ROWS_PER_PAGE)
+    grid_width = MENU_BUTTONS_PER_ROW * _MENU_CELL_W - MENU_BUTTON_PADDING
+    grid_height = rows * _MENU_CELL_H - MENU_BUTTON_PADDING
+    horizontal_margin = 80
+    vertical_margin_bottom = 100
+    width = max(grid_width + horizontal_margin * 2, INITIAL_SCREEN_WIDTH)
+    height = MENU_TITLE_AREA_HEIGHT + grid_height + vertical_margin_bottom + 50
+    if menu_page_count(num_levels) > 1:
+        height += MENU_PAGER_HEIGHT
+    return int(width), int(height)
+
+
+def _menu_grid_origin(screen_width):
+    grid_width = MENU_BUTTONS_PER_ROW * _MENU_CELL_W - MENU_BUTTON_PADDING
+    return (screen_width - grid_width) // 2, MENU_TITLE_AREA_HEIGHT + 20
+
+
+def menu_button_rect(button_idx, screen_width, screen_height):
+    """Rect of a level button on its page, or of the quit button when button_idx == len(loader.levels)."""
+    if button_idx == len(loader.levels):
+        quit_btn_width, quit_btn_height = 220, 50
+        return pygame.Rect((screen_width - quit_btn_width) // 2, screen_height - quit_btn_height - 30, quit_btn_width, quit_btn_height)
+    grid_x, grid_y = _menu_grid_origin(screen_width)
+    row_idx, col_idx = divmod(button_idx % MENU_BUTTONS_PER_PAGE, MENU_BUTTONS_PER_ROW)
+    return pygame.Rect(grid_x + col_idx * _MENU_CELL_W, grid_y + row_idx * _MENU_CELL_H, MENU_BUTTON_WIDTH, MENU_BUTTON_HEIGHT)
+
+
+def menu_button_at(pos, page, screen_width, screen_height):
+    """O(1) hit test: index of the button under `pos` on `page` (len(levels) for quit), or -1."""
+    num_levels = len(loader.levels)
+    if menu_button_rect(num_levels, screen_width, screen_height).collidepoint(pos):
+        return num_levels
+    grid_x, grid_y = _menu_grid_origin(screen_width)
+    col_idx, x_in_cell = divmod(pos[0] - grid_x, _MENU_CELL_W)
+    row_idx, y_in_cell = divmod(pos[1] - grid_y, _MENU_CELL_H)
+    if not (0 <= col_idx < MENU_BUTTONS_PER_ROW and 0 <= row_idx < MENU_ROWS_PER_PAGE):
+        return -1
+    if x_in_cell >= MENU_BUTTON_WIDTH or y_in_cell >= MENU_BUTTON_HEIGHT:
+        return -1 # In the padding between buttons
+    idx = page * MENU_BUTTONS_PER_PAGE + row_idx * MENU_BUTTONS_PER_ROW + col_idx
+    return idx if idx < num_levels else -1
+
+
+def draw_level_selection_menu(screen_surface, selected_button_idx, current_screen_width, current_screen_height, mouse_pos, page=0, thumbnails=None):
+    """
+    Draws one page of the level selection menu. Handles screen resizing.
+    `thumbnails` (a thumbnails.ThumbnailCache) supplies level previews that are already loaded.
     Returns:
-        tuple: (button_rects_list, new_screen_surface, new_screen_width, new_screen_height)
+        tuple: (visible_button_rects_dict, new_screen_surface, new_screen_width, new_screen_height)
+        The dict maps button index (len(levels) is the quit button) to its rect.
     """
     new_screen_width = current_screen_width
     new_screen_height = current_screen_height
     
     screen_surface.fill(MENU_BACKGROUND_COLOR)
 
-    if not levels: # levels is imported from loader
+    levels = loader.levels
+    if not levels:
         # Adjust screen for error message
         target_width, target_height = 700, 350
         if new_screen_width != target_width or new_screen_height != target_height:
@@ -44,10 +146,10 @@ def draw_level_selection_menu(screen_surface, selected_button_idx, current_scree
             # Re-fill after resize
             screen_surface.fill(MENU_BACKGROUND_COLOR)
         
-        if FONT_MEDIUM and FONT_SMALL: # Check if fonts loaded
-            draw_text("错误：未找到或加载任何关卡！", FONT_MEDIUM, RED, screen_surface, new_screen_width // 2, 80, centered=True)
-            draw_text(f"请在 '{LEVELS_DIR}' 目录下", FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, 150, centered=True)
-            draw_text("添加有效的关卡文件 (如 level1.txt)。", FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, 180, centered=True)
+        if loader.FONT_MEDIUM and loader.FONT_SMALL: # Check if fonts loaded
+            draw_text("错误：未找到或加载任何关卡！", loader.FONT_MEDIUM, RED, screen_surface, new_screen_width // 2, 80, centered=True)
+            draw_text(f"请在 '{LEVELS_DIR}' 目录下", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, 150, centered=True)
+            draw_text("添加有效的关卡文件 (如 level1.txt)。", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, 180, centered=True)
         else: # Fallback if fonts are not available
             print("ERROR: Fonts not loaded, cannot display level loading error message on screen.")
 
@@ -59,130 +161,408 @@ def draw_level_selection_menu(screen_surface, selected_button_idx, current_scree
         btn_color = MENU_QUIT_BUTTON_HOVER_COLOR if is_hovered else MENU_QUIT_BUTTON_COLOR
         pygame.draw.rect(screen_surface, btn_color, quit_btn_rect, border_radius=MENU_BORDER_RADIUS)
         pygame.draw.rect(screen_surface, MENU_BUTTON_BORDER_COLOR, quit_btn_rect, 2, border_radius=MENU_BORDER_RADIUS)
-        if FONT_SMALL:
-            draw_text("退出游戏", FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, quit_btn_rect.centerx, quit_btn_rect.centery, centered=True)
-        return [quit_btn_rect], screen_surface, new_screen_width, new_screen_height
+        if loader.FONT_SMALL:
+            draw_text("退出游戏", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, quit_btn_rect.centerx, quit_btn_rect.centery, centered=True)
+        return {0: quit_btn_rect}, screen_surface, new_screen_width, new_screen_height
 
-    title_area_height = 100
-    if FONT_LARGE:
-        draw_text("选择关卡", FONT_LARGE, MENU_TITLE_COLOR, screen_surface, current_screen_width // 2, title_area_height // 2, centered=True)
+    required_width, required_height = menu_window_size(len(levels))
+    if current_screen_width != required_width or current_screen_height != required_height:
+        new_screen_width, new_screen_height = required_width, required_height
+        screen_surface = pygame.display.set_mode((new_screen_width, new_screen_height))
+        screen_surface.fill(MENU_BACKGROUND_COLOR) # Re-fill after resize
 
-    num_button_rows = (len(levels) + MENU_BUTTONS_PER_ROW - 1) // MENU_BUTTONS_PER_ROW
-    buttons_grid_width = MENU_BUTTONS_PER_ROW * (MENU_BUTTON_WIDTH + MENU_BUTTON_PADDING) - MENU_BUTTON_PADDING
-    buttons_grid_height = num_button_rows * (MENU_BUTTON_HEIGHT + MENU_BUTTON_PADDING) - MENU_BUTTON_PADDING
+    if loader.FONT_LARGE:
+        draw_text("选择关卡", loader.FONT_LARGE, MENU_TITLE_COLOR, screen_surface, new_screen_width // 2, MENU_TITLE_AREA_HEIGHT // 2, centered=True)
 
-    horizontal_margin = 80
-    vertical_margin_bottom = 100 
+    # Only the buttons of the current page are laid out and drawn
+    button_rects = {}
+    first = page * MENU_BUTTONS_PER_PAGE
+    for i in range(first, min(len(levels), first + MENU_BUTTONS_PER_PAGE)):
+        rect = menu_button_rect(i, new_screen_width, new_screen_height)
+        thumbnail = thumbnails.get(i) if thumbnails is not None else None
+        button_rects[i] = draw_menu_button(screen_surface, i, rect, selected_button_idx, mouse_pos, thumbnail)
 
-    # Dynamically adjust screen size
-    required_width = max(buttons_grid_width + horizontal_margin * 2, INITIAL_SCREEN_WIDTH) # INITIAL_SCREEN_WIDTH from constants
-    required_height = title_area_height + buttons_grid_height + vertical_margin_bottom + 50
+    pages = menu_page_count(len(levels))
+    if pages > 1 and loader.FONT_SMALL:
+        pager_y = new_screen_height - MENU_QUIT_AREA_HEIGHT - MENU_PAGER_HEIGHT // 2
+        draw_text(f"第 {page + 1}/{pages} 页  (PgUp/PgDn 翻页)", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface,
+                  new_screen_width // 2, pager_y, centered=True)
 
-    if current_screen_width != required_width or current_screen_height != required_height:
-        new_screen_width, new_screen_height = int(required_width), int(required_height)
-        screen_surface = pygame.display.set_mode((new_screen_width, new_screen_height))
-        screen_surface.fill(MENU_BACKGROUND_COLOR) # Re-fill after resize
-        if FONT_LARGE: # Re-draw title if it was drawn
-            draw_text("选择关卡", FONT_LARGE, MENU_TITLE_COLOR, screen_surface, new_screen_width // 2, title_area_height // 2, centered=True)
-
-    button_rects = []
-    grid_start_x = (new_screen_width - buttons_grid_width) // 2
-    grid_start_y = title_area_height + 20
-
-    for i in range(len(levels)):
-        row_idx = i // MENU_BUTTONS_PER_ROW
-        col_idx = i % MENU_BUTTONS_PER_ROW
-        btn_x = grid_start_x + col_idx * (MENU_BUTTON_WIDTH + MENU_BUTTON_PADDING)
-        btn_y = grid_start_y + row_idx * (MENU_BUTTON_HEIGHT + MENU_BUTTON_PADDING)
-        rect = pygame.Rect(btn_x, btn_y, MENU_BUTTON_WIDTH, MENU_BUTTON_HEIGHT)
-        button_rects.append(rect)
-
-        is_selected_by_kb = (i == selected_button_idx)
-        is_hovered_by_mouse = rect.collidepoint(mouse_pos)
-
-        btn_color = MENU_BUTTON_COLOR
-        if is_hovered_by_mouse or is_selected_by_kb:
-            btn_color = MENU_BUTTON_HOVER_COLOR
-
-        pygame.draw.rect(screen_surface, btn_color, rect, border_radius=MENU_BORDER_RADIUS)
-        border_color = MENU_BUTTON_SELECTED_BORDER_COLOR if is_selected_by_kb else MENU_BUTTON_BORDER_COLOR
-        pygame.draw.rect(screen_surface, border_color, rect, 2, border_radius=MENU_BORDER_RADIUS)
-        if FONT_BUTTON:
-            draw_text(str(i + 1), FONT_BUTTON, MENU_BUTTON_TEXT_COLOR, screen_surface, rect.centerx, rect.centery, centered=True)
-
-    quit_btn_width = 220
-    quit_btn_height = 50
-    quit_btn_rect = pygame.Rect((new_screen_width - quit_btn_width) // 2, new_screen_height - quit_btn_height - 30, quit_btn_width, quit_btn_height)
-    button_rects.append(quit_btn_rect)
-
-    is_quit_selected_by_kb = (selected_button_idx == len(levels)) 
-    is_quit_hovered_by_mouse = quit_btn_rect.collidepoint(mouse_pos)
-    quit_color = MENU_QUIT_BUTTON_COLOR
-    if is_quit_hovered_by_mouse or is_quit_selected_by_kb:
-        quit_color = MENU_QUIT_BUTTON_HOVER_COLOR
-
-    pygame.draw.rect(screen_surface, quit_color, quit_btn_rect, border_radius=MENU_BORDER_RADIUS)
-    quit_border_color = MENU_BUTTON_SELECTED_BORDER_COLOR if is_quit_selected_by_kb else MENU_BUTTON_BORDER_COLOR
-    pygame.draw.rect(screen_surface, quit_border_color, quit_btn_rect, 2, border_radius=MENU_BORDER_RADIUS)
-    if FONT_SMALL:
-        draw_text("退出游戏", FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, quit_btn_rect.centerx, quit_btn_rect.centery, centered=True)
+    quit_idx = len(levels)
+    button_rects[quit_idx] = draw_menu_button(screen_surface, quit_idx, menu_button_rect(quit_idx, new_screen_width, new_screen_height),
+                                              selected_button_idx, mouse_pos)
 
     return button_rects, screen_surface, new_screen_width, new_screen_height
 
 
-def draw_game_screen(screen_surface, current_level_data_param, player_pos_param, 
+# --- Cached game screen layers ---
+# Walls, floors and goals never change within a level, so they are baked into
+# one Surface per level; each frame blits it and then only boxes and the player.
+# The HUD strip is cached the same way and re-rendered only when its text changes.
+MAX_STATIC_LAYER_PIXELS = 4096 * 4096 # Larger levels fall back to per-tile drawing
+_static_layer = None # (board, tile size, surface)
+_hud_layer = None # (key, surface)
+_overlay_layer = None # (size, surface)
+
+# --- Camera ---
+# Levels larger than MAX_VIEW_COLS x MAX_VIEW_ROWS are shown through a fixed-size
+# view that follows the player; everything below only touches the cells inside
+# it, so the cost per frame does not depend on the size of the map.
+#
+# Zoom: tiles are drawn at one of ZOOM_LEVELS pixels (scaled sets come from
+# tile_cache). The map area keeps its size; zooming changes how many cells fit.
+_camera = None # (board, col, row): map cell shown in the view's top-left corner
+_zoom = None # (board, tile size)
+_minimap = None # (board, board.box_changes, box cells, cell buffer, 8-bit surface, scaled surface, scale)
+_MINIMAP_PALETTE = None
+
+# --- Frame profiler hook ---
+# Game sets this to its profiler.FrameProfiler while profiling, so the board and
+# HUD parts of draw_game_screen are timed separately; None costs one `if`.
+profiler = None
+_profiler_font = None
+
+
+def view_area(board):
+    """Pixel size of the map area for `board` (game_logic.setup_level sizes the window from it). Independent of zoom."""
+    return max(min(board.cols, MAX_VIEW_COLS), 1) * TILE_SIZE, max(min(board.rows, MAX_VIEW_ROWS), 1) * TILE_SIZE
+
+
+def fit_tile_size(board):
+    """Largest zoom level <= TILE_SIZE that shows all of `board`, else the smallest zoom level."""
+    area_w, area_h = view_area(board)
+    for size in sorted(ZOOM_LEVELS, reverse=True):
+        if size <= TILE_SIZE and board.cols * size <= area_w and board.rows * size <= area_h:
+            return size
+    return min(ZOOM_LEVELS)
+
+
+def tile_size_for(board):
+    """Current tile size for `board`; a new level starts at fit_tile_size."""
+    global _zoom
+    if _zoom is None or _zoom[0] is not board:
+        _zoom = (board, fit_tile_size(board))
+    return _zoom[1]
+
+
+def set_zoom(board, size):
+    """Draws `board` at `size` pixels per tile from now on. Returns True if the zoom changed."""
+    global _zoom, _camera
+    if size == tile_size_for(board):
+        return False
+    _zoom = (board, size)
+    _camera = None # Re-centre on the player at the new scale
+    return True
+
+
+def zoom(board, steps):
+    """Zooms in (steps > 0) or out (steps < 0) by whole ZOOM_LEVELS. Returns True if the zoom changed."""
+    sizes = sorted(ZOOM_LEVELS)
+    current = tile_size_for(board)
+    i = sizes.index(current) if current in sizes else len(sizes) - 1
+    return set_zoom(board, sizes[max(0, min(len(sizes) - 1, i + steps))])
+
+
+def view_size(board):
+    """(cols, rows) of map cells that fit in the view for `board` at its current zoom."""
+    size = tile_size_for(board)
+    area_w, area_h = view_area(board)
+    return max(min(board.cols, area_w // size), 1), max(min(board.rows, area_h // size), 1)
+
+
+def _follow(pos, start, view, size):
+    margin = min(CAMERA_MARGIN, (view - 1) // 2)
+    if pos < start + margin:
+        start = pos - margin
+    elif pos > start + view - 1 - margin:
+        start = pos - view + 1 + margin
+    return max(0, min(start, size - view))
+
+
+def update_camera(board):
+    """Scrolls the view so the player keeps CAMERA_MARGIN cells from its edges. Returns the camera (col, row)."""
+    global _camera
+    view_cols, view_rows = view_size(board)
+    pr, pc = board.coords(board.player)
+    if _camera is None or _camera[0] is not board:
+        col, row = pc - view_cols // 2, pr - view_rows // 2 # New level: start centred on the player
+    else:
+        col, row = _camera[1], _camera[2]
+    col = _follow(pc, col, view_cols, board.cols)
+    row = _follow(pr, row, view_rows, board.rows)
+    _camera = (board, col, row)
+    return col, row
+
+
+def camera_origin(board):
+    """The current camera (col, row) for `board`, placing it first if needed."""
+    if _camera is None or _camera[0] is not board:
+        return update_camera(board)
+    return _camera[1], _camera[2]
+
+
+def _draw_static_tiles(surface, board, with_boxes, view=None):
+    """
+    Blits floor/goal/wall tiles (and optionally boxes) for the cells in
+    `view` = (col, row, cols, rows), or for every cell of `board`.
+    """
+    col0, row0, view_cols, view_rows = view or (0, 0, board.cols, board.rows)
+    size = tile_size_for(board)
+    tiles = get_tiles(size)
+    static, dynamic, width = board.static, board.dynamic, board.width
+    floor_img, goal_img, wall_img = tiles["floor"], tiles["goal"], tiles["wall"]
+    box_img, box_on_goal_img = tiles["box"], tiles["box_on_goal"]
+    blit = surface.blit
+    for r in range(row0, min(row0 + view_rows, board.rows)):
+        i = (r + 1) * width + 1 + col0 # Flat index of (r, col0)
+        y = (r - row0) * size
+        for c in range(col0, min(col0 + view_cols, board.cols)):
+            flags = static[i]
+            if not flags & S_VOID: # Void cells lie outside the map's rows
+                draw_pos = ((c - col0) * size, y)
+                # Draw goal under player/box if the tile is a goal
+                blit(goal_img if flags & S_GOAL else floor_img, draw_pos)
+                if flags & S_WALL:
+                    blit(wall_img, draw_pos)
+                elif with_boxes and dynamic[i]:
+                    blit(box_on_goal_img if flags & S_GOAL else box_img, draw_pos)
+            i += 1
+
+
+def bake_static_layer(board):
+    """
+    Pre-renders the static tiles of `board` at its current zoom into one Surface.
+    Returns it, or None if the level is too large.
+    """
+    global _static_layer
+    size = tile_size_for(board)
+    _static_layer = (board, size, None)
+    if not loader.IMAGES or board.cols * board.rows * size * size > MAX_STATIC_LAYER_PIXELS:
+        return None
+    surface = pygame.Surface((max(board.cols, 1) * size, max(board.rows, 1) * size))
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert()
+    surface.fill(BLACK)
+    _draw_static_tiles(surface, board, with_boxes=False)
+    _static_layer = (board, size, surface)
+    return surface
+
+
+def _current_static_layer(board):
+    """The baked static layer for `board` at its current zoom (baking it if needed), or None."""
+    if _static_layer is None or _static_layer[0] is not board or _static_layer[1] != tile_size_for(board):
+        bake_static_layer(board)
+    return _static_layer[2]
+
+
+def _minimap_surface(board):
+    """One pixel per cell (8-bit, palette = static flags + 8 for a box), scaled to fit MINIMAP_MAX_SIZE."""
+    global _minimap, _MINIMAP_PALETTE
+    if _minimap is not None and _minimap[0] is board:
+        _, changes, boxes, cells, padded, surface, scale = _minimap
+        if changes == board.box_changes:
+            return surface, scale
+        # A push moves one box: repaint just the cells whose box bit changed, in the buffer the surface shares
+        new_boxes = set(board.box_cells())
+        for i in boxes ^ new_boxes:
+            cells[i] = board.static[i] | (8 if board.dynamic[i] else 0)
+        surface = _scale_minimap(board, padded, scale)
+        _minimap = (board, board.box_changes, new_boxes, cells, padded, surface, scale)
+        return surface, scale
+    if _MINIMAP_PALETTE is None:
+        _MINIMAP_PALETTE = [BLACK] * 16
+        for flags in range(8):
+            if flags & S_VOID:
+                continue
+            _MINIMAP_PALETTE[flags] = MINIMAP_WALL_COLOR if flags & S_WALL else (
+                MINIMAP_GOAL_COLOR if flags & S_GOAL else MINIMAP_FLOOR_COLOR)
+            _MINIMAP_PALETTE[flags | 8] = MINIMAP_BOX_ON_GOAL_COLOR if flags & S_GOAL else MINIMAP_BOX_COLOR
+    boxes = set(board.box_cells())
+    cells = bytearray(board.static) # Box cells get bit 3 on top of their static flags
+    for i in boxes:
+        cells[i] |= 8
+    padded = pygame.image.frombuffer(cells, (board.width, len(cells) // board.width), "P")
+    padded.set_palette(_MINIMAP_PALETTE)
+    scale = min(MINIMAP_MAX_SIZE[0] / board.cols, MINIMAP_MAX_SIZE[1] / board.rows)
+    surface = _scale_minimap(board, padded, scale)
+    _minimap = (board, board.box_changes, boxes, cells, padded, surface, scale)
+    return surface, scale
+
+
+def _scale_minimap(board, padded, scale):
+    image = padded.subsurface((1, 1, board.cols, board.rows))
+    return pygame.transform.scale(image, (max(1, int(board.cols * scale)), max(1, int(board.rows * scale))))
+
+
+def needs_minimap(board):
+    view_cols, view_rows = view_size(board)
+    return board.cols > view_cols or board.rows > view_rows
+
+
+def draw_minimap(screen_surface, board):
+    """Draws the minimap (map, player and view outline) in the top-right corner of the view. Returns its rect."""
+    surface, scale = _minimap_surface(board)
+    view_cols, view_rows = view_size(board)
+    col0, row0 = camera_origin(board)
+    rect = surface.get_rect(topright=(view_area(board)[0] - 8, 8))
+    screen_surface.blit(surface, rect)
+    pr, pc = board.coords(board.player)
+    dot = max(2, int(scale))
+    pygame.draw.rect(screen_surface, MINIMAP_PLAYER_COLOR, (rect.x + int(pc * scale), rect.y + int(pr * scale), dot, dot))
+    pygame.draw.rect(screen_surface, MINIMAP_VIEW_COLOR, (rect.x + int(col0 * scale), rect.y + int(row0 * scale),
+                                                          max(2, int(view_cols * scale)), max(2, int(view_rows * scale))), 1)
+    pygame.draw.rect(screen_surface, MINIMAP_VIEW_COLOR, rect.inflate(2, 2), 1)
+    return rect.inflate(2, 2)
+
+
+def draw_hud(screen_surface, board_param, current_level_index_param, total_levels_param,
+             screen_width_param, screen_height_param, deadlocked_param=False, hint_text_param=None):
+    """Draws the info strip below the view. Returns its screen rect."""
+    global _hud_layer
+    info_area_y = view_area(board_param)[1]
+    key = (current_level_index_param, total_levels_param, screen_width_param, screen_height_param,
+           info_area_y, deadlocked_param, hint_text_param)
+    if _hud_layer is None or _hud_layer[0] != key:
+        hud = pygame.Surface((screen_width_param, max(screen_height_param - info_area_y, 1)))
+        hud.fill(GAME_INFO_BG_COLOR)
+        pad, line_h = 15, 28
+        draw_text(f"关卡: {current_level_index_param + 1}/{total_levels_param}", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, pad, pad)
+        draw_text("R: 重玩", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, pad, pad + line_h)
+        draw_text("U/Y: 撤销/重做", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, pad + 120, pad + line_h)
+        draw_text("B/V: 切换bgm", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, pad + 240, pad + line_h)
+        draw_text("H: 提示", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, pad + 120, pad)
+        draw_text("Esc: 菜单", loader.FONT_SMALL, GAME_INFO_TEXT_COLOR, hud, screen_width_param - 150 - pad, pad)
+        if deadlocked_param:
+            draw_text("死局! 按 U 撤销", loader.FONT_SMALL, RED, hud, pad, pad + line_h * 2)
+        if hint_text_param:
+            draw_text(hint_text_param, loader.FONT_SMALL, GREEN, hud, pad + 180, pad + line_h * 2)
+        _hud_layer = (key, hud)
+    return screen_surface.blit(_hud_layer[1], (0, info_area_y))
+
+
+def draw_game_cells(screen_surface, board_param, cells):
+    """
+    Repaints only the given flat cell indices (static tile, then box, then player),
+    in the same order draw_game_screen uses. Cells outside the view are skipped.
+    Returns the screen rects that changed.
+    """
+    static_surface = _current_static_layer(board_param)
+    size = tile_size_for(board_param)
+    tiles = get_tiles(size)
+    view_cols, view_rows = view_size(board_param)
+    col0, row0 = camera_origin(board_param)
+    static, dynamic = board_param.static, board_param.dynamic
+    rects = []
+    for i in cells:
+        r, c = board_param.coords(i)
+        if not (row0 <= r < min(row0 + view_rows, board_param.rows) and col0 <= c < min(col0 + view_cols, board_param.cols)):
+            continue # Padding cells and cells outside the view are never drawn
+        rect = pygame.Rect((c - col0) * size, (r - row0) * size, size, size)
+        flags = static[i]
+        if static_surface is not None:
+            screen_surface.blit(static_surface, rect, rect.move(col0 * size, row0 * size))
+        else:
+            screen_surface.fill(BLACK, rect)
+            if not flags & S_VOID:
+                screen_surface.blit(tiles["goal"] if flags & S_GOAL else tiles["floor"], rect)
+                if flags & S_WALL:
+                    screen_surface.blit(tiles["wall"], rect)
+        if dynamic[i]:
+            screen_surface.blit(tiles["box_on_goal"] if flags & S_GOAL else tiles["box"], rect)
+        if i == board_param.player:
+            screen_surface.blit(tiles["player_on_goal"] if flags & S_GOAL else tiles["player"], rect)
+        rects.append(rect)
+    return rects
+
+
+def draw_game_screen(screen_surface, board_param, 
                      current_level_index_param, total_levels_param, 
                      screen_width_param, screen_height_param, 
-                     game_state_param, is_original_goal_tile_func):
+                     game_state_param, deadlocked_param=False, hint_text_param=None):
     """Draws the main game screen with level, player, boxes, and info."""
+    global _overlay_layer
     screen_surface.fill(BLACK) # Background for game area
 
     # Draw game elements: floor, goals, walls, boxes
-    if FONT_SMALL and IMAGES: # Check if resources are loaded
-        for r, row in enumerate(current_level_data_param):
-            for c, tile_char in enumerate(row):
-                draw_pos = (c * TILE_SIZE, r * TILE_SIZE)
-                # Draw goal under player/box if original tile was a goal
-                if is_original_goal_tile_func(r, c, current_level_index_param):
-                    screen_surface.blit(IMAGES["goal"], draw_pos)
-                else:
-                    screen_surface.blit(IMAGES["floor"], draw_pos)
-
-                if tile_char == WALL: # WALL from constants
-                    screen_surface.blit(IMAGES["wall"], draw_pos)
-                elif tile_char == BOX: # BOX from constants
-                    screen_surface.blit(IMAGES["box"], draw_pos)
-                elif tile_char == BOX_ON_GOAL: # BOX_ON_GOAL from constants
-                    screen_surface.blit(IMAGES["box_on_goal"], draw_pos)
+    if loader.FONT_SMALL and loader.IMAGES: # Check if resources are loaded
+        static_surface = _current_static_layer(board_param)
+        size = tile_size_for(board_param)
+        tiles = get_tiles(size)
+        view_cols, view_rows = view_size(board_param)
+        col0, row0 = camera_origin(board_param)
+        if static_surface is not None:
+            screen_surface.blit(static_surface, (0, 0),
+                                (col0 * size, row0 * size, view_cols * size, view_rows * size))
+            # Only the moving pieces are drawn per frame, and only within the view's rows
+            static, dynamic, width = board_param.static, board_param.dynamic, board_param.width
+            box_img, box_on_goal_img = tiles["box"], tiles["box_on_goal"]
+            for r in range(row0, min(row0 + view_rows, board_param.rows)):
+                start = (r + 1) * width + 1 + col0
+                end = start + min(view_cols, board_param.cols - col0)
+                i = dynamic.find(1, start, end)
+                while i >= 0:
+                    screen_surface.blit(box_on_goal_img if static[i] & S_GOAL else box_img,
+                                        ((i - start) * size, (r - row0) * size))
+                    i = dynamic.find(1, i + 1, end)
+        else:
+            _draw_static_tiles(screen_surface, board_param, with_boxes=True, view=(col0, row0, view_cols, view_rows))
         
         # Draw player
-        pr, pc = player_pos_param
-        player_img_key = "player_on_goal" if is_original_goal_tile_func(pr, pc, current_level_index_param) else "player"
-        if player_img_key in IMAGES:
-             screen_surface.blit(IMAGES[player_img_key], (pc * TILE_SIZE, pr * TILE_SIZE))
+        pr, pc = board_param.coords(board_param.player)
+        player_img_key = "player_on_goal" if board_param.static[board_param.player] & S_GOAL else "player"
+        if player_img_key in tiles:
+             screen_surface.blit(tiles[player_img_key], ((pc - col0) * size, (pr - row0) * size))
+
+        if needs_minimap(board_param):
+            draw_minimap(screen_surface, board_param)
+        if profiler: profiler.lap("render_board")
 
         # Draw info area
-        info_area_y = len(current_level_data_param) * TILE_SIZE
-        pygame.draw.rect(screen_surface, GAME_INFO_BG_COLOR, (0, info_area_y, screen_width_param, screen_height_param - info_area_y))
-        
-        pad, line_h = 15, 28
-        draw_text(f"关卡: {current_level_index_param + 1}/{total_levels_param}", FONT_SMALL, GAME_INFO_TEXT_COLOR, screen_surface, pad, info_area_y + pad)
-        draw_text("R: 重玩", FONT_SMALL, GAME_INFO_TEXT_COLOR, screen_surface, pad, info_area_y + pad + line_h)
-        draw_text("U: 撤销", FONT_SMALL, GAME_INFO_TEXT_COLOR, screen_surface, pad + 120, info_area_y + pad + line_h)
-        draw_text("B/V: 切换bgm", FONT_SMALL, GAME_INFO_TEXT_COLOR, screen_surface, pad + 240, info_area_y + pad + line_h)
-        draw_text("Esc: 菜单", FONT_SMALL, GAME_INFO_TEXT_COLOR, screen_surface, screen_width_param - 150 - pad, info_area_y + pad)
+        draw_hud(screen_surface, board_param, current_level_index_param, total_levels_param,
+                 screen_width_param, screen_height_param, deadlocked_param, hint_text_param)
+        if profiler: profiler.lap("render_hud")
 
         if game_state_param == "level_complete":
-            overlay = pygame.Surface((screen_width_param, screen_height_param), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180)) # Semi-transparent black
-            screen_surface.blit(overlay, (0, 0))
-            if FONT_LARGE and FONT_MEDIUM:
-                draw_text("关卡完成!", FONT_LARGE, GREEN, screen_surface, screen_width_param // 2, screen_height_param // 2 - 40, centered=True)
-                draw_text("按 Enter 或 空格 继续", FONT_MEDIUM, WHITE, screen_surface, screen_width_param // 2, screen_height_param // 2 + 20, centered=True)
+            size = (screen_width_param, screen_height_param)
+            if _overlay_layer is None or _overlay_layer[0] != size:
+                overlay = pygame.Surface(size, pygame.SRCALPHA)
+                overlay.fill((0, 0, 0, 180)) # Semi-transparent black
+                _overlay_layer = (size, overlay)
+            screen_surface.blit(_overlay_layer[1], (0, 0))
+            if loader.FONT_LARGE and loader.FONT_MEDIUM:
+                draw_text("关卡完成!", loader.FONT_LARGE, GREEN, screen_surface, screen_width_param // 2, screen_height_param // 2 - 40, centered=True)
+                draw_text("按 Enter 或 空格 继续", loader.FONT_MEDIUM, WHITE, screen_surface, screen_width_param // 2, screen_height_param // 2 + 20, centered=True)
     else:
         print("ERROR: Fonts or Images not loaded, cannot draw game screen properly.")
 
 
+def draw_profiler_overlay(screen_surface, frame_profiler):
+    """Draws the F3 frame-time table (p50/p95/p99 per phase, in ms) in the top-left corner. Returns its rect."""
+    global _profiler_font
+    if _profiler_font is None:
+        pygame.font.init()
+        _profiler_font = pygame.font.Font(None, 18) # Default font: ASCII only, available without assets
+    rows = [("frame ms", "p50", "p95", "p99")]
+    for phase in frame_profiler.samples:
+        p = frame_profiler.percentiles(phase)
+        rows.append((phase,) + (tuple(f"{v:.2f}" for v in p) if p else ("-", "-", "-")))
+    rows.append((f"{frame_profiler.frames} frames", "", "", ""))
+    # Rendered directly, not through text_cache: the changing numbers would evict the
+    # game's own text and show up in the text_renders column the profiler records
+    line_h = _profiler_font.get_linesize()
+    name_w, num_w = 96, 48
+    rect = pygame.Rect(4, 4, name_w + num_w * 3 + 12, line_h * len(rows) + 8)
+    pygame.draw.rect(screen_surface, BLACK, rect)
+    for n, (name, *numbers) in enumerate(rows):
+        y = rect.y + 4 + n * line_h
+        screen_surface.blit(_profiler_font.render(name, True, GREEN), (rect.x + 6, y))
+        for k, text in enumerate(numbers):
+            if text:
+                surface = _profiler_font.render(text, True, GREEN)
+                screen_surface.blit(surface, (rect.x + 6 + name_w + num_w * (k + 1) - surface.get_width(), y))
+    return rect
+
+
 def draw_game_completion_screen(screen_surface, current_screen_width, current_screen_height):
     """
     Draws the game completion screen when all levels are finished.
@@ -199,10 +579,10 @@ def draw_game_completion_screen(screen_surface, current_screen_width, current_sc
         screen_surface = pygame.display.set_mode((new_screen_width, new_screen_height))
 
     screen_surface.fill(MENU_BACKGROUND_COLOR)
-    if FONT_LARGE and FONT_MEDIUM and FONT_SMALL: # Check if fonts loaded
-        draw_text("恭喜你，全部通关!", FONT_LARGE, GREEN, screen_surface, new_screen_width // 2, new_screen_height // 2 - 70, centered=True)
-        draw_text("你是推箱子大师！", FONT_MEDIUM, MENU_TITLE_COLOR, screen_surface, new_screen_width // 2, new_screen_height // 2 - 10, centered=True)
-        draw_text("按 Esc 返回菜单，或 Q 退出游戏", FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, new_screen_height // 2 + 50, centered=True)
+    if loader.FONT_LARGE and loader.FONT_MEDIUM and loader.FONT_SMALL: # Check if fonts loaded
+        draw_text("恭喜你，全部通关!", loader.FONT_LARGE, GREEN, screen_surface, new_screen_width // 2, new_screen_height // 2 - 70, centered=True)
+        draw_text("你是推箱子大师！", loader.FONT_MEDIUM, MENU_TITLE_COLOR, screen_surface, new_screen_width // 2, new_screen_height // 2 - 10, centered=True)
+        draw_text("按 Esc 返回菜单，或 Q 退出游戏", loader.FONT_SMALL, MENU_BUTTON_TEXT_COLOR, screen_surface, new_screen_width // 2, new_screen_height // 2 + 50, centered=True)
     else:
         print("ERROR: Fonts not loaded, cannot display game completion screen.")
         
@@ -225,14 +605,14 @@ if __name__ == '__main__':
     mock_selected_button_idx = 0
 
     # Test draw_text (implicitly tested by other functions)
-    if FONT_SMALL:
-        draw_text("UI Test Mode", FONT_SMALL, WHITE, mock_screen_surface, 10, 10)
+    if loader.FONT_SMALL:
+        draw_text("UI Test Mode", loader.FONT_SMALL, WHITE, mock_screen_surface, 10, 10)
     else:
-        print("FONT_SMALL not loaded, skipping draw_text direct test.")
+        print("loader.FONT_SMALL not loaded, skipping draw_text direct test.")
 
     # Test draw_level_selection_menu
     print("\nTesting draw_level_selection_menu...")
-    if FONT_LARGE and FONT_MEDIUM and FONT_SMALL and FONT_BUTTON: # Ensure fonts are loaded
+    if loader.FONT_LARGE and loader.FONT_MEDIUM and loader.FONT_SMALL and loader.FONT_BUTTON: # Ensure fonts are loaded
         button_rects, new_surface, new_w, new_h = draw_level_selection_menu(mock_screen_surface, mock_selected_button_idx, mock_current_screen_width, mock_current_screen_height, mock_mouse_pos)
         print(f"  Returned {len(button_rects)} button rects. New screen: {new_w}x{new_h}")
         mock_screen_surface = new_surface # Update surface if resized
@@ -246,19 +626,16 @@ if __name__ == '__main__':
     # Test draw_game_screen
     print("\nTesting draw_game_screen...")
     # Mock game data (normally from game_logic.py and main.py)
-    mock_level_data = [list("####"), list("# @#"), list("#  #"), list("####")] # Player at (1,2)
-    mock_player_pos = (1, 2)
+    from board import Board
+    mock_board = Board(["####", "# @#", "#  #", "####"]) # Player at (1,2)
     mock_level_idx = 0
     mock_total_levels = 1 # len(levels)
-    
-    # Mock is_original_goal_tile function (normally from game_logic.py)
-    def mock_is_original_goal(r, c, level_idx): return False
 
-    if FONT_SMALL and IMAGES: # Check if resources are loaded
-        draw_game_screen(mock_screen_surface, mock_level_data, mock_player_pos, 
+    if loader.FONT_SMALL and loader.IMAGES: # Check if resources are loaded
+        draw_game_screen(mock_screen_surface, mock_board, 
                          mock_level_idx, mock_total_levels, 
                          mock_current_screen_width, mock_current_screen_height, 
-                         "playing", mock_is_original_goal)
+                         "playing")
     else:
         print("  Skipping draw_game_screen test as fonts or images are not loaded.")
 
@@ -267,7 +644,7 @@ if __name__ == '__main__':
 
     # Test draw_game_completion_screen
     print("\nTesting draw_game_completion_screen...")
-    if FONT_LARGE and FONT_MEDIUM and FONT_SMALL: # Ensure fonts are loaded
+    if loader.FONT_LARGE and loader.FONT_MEDIUM and loader.FONT_SMALL: # Ensure fonts are loaded
         new_surface, new_w, new_h = draw_game_completion_screen(mock_screen_surface, mock_current_screen_width, mock_current_screen_height)
         print(f"  New screen: {new_w}x{new_h}")
     else: